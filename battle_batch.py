@@ -0,0 +1,142 @@
+# battle_batch.py
+
+import numpy as np
+
+from battle_engine import Fighter, MAX_TICKS, heavy_attack_chance, time_inc_for_speed
+
+
+# winner codes
+FIGHTER1 = 0
+FIGHTER2 = 1
+DRAW = -1
+
+
+# stat vectors for one side of every battle
+def stat_arrays(fighter_list):
+    return {
+        "max_health":    np.array([f.max_health for f in fighter_list], dtype=np.int64),
+        "strength":      np.array([f.strength for f in fighter_list], dtype=np.int64),
+        "defense":       np.array([f.defense for f in fighter_list], dtype=np.int64),
+        "stamina":       np.array([f.stamina for f in fighter_list], dtype=np.int64),
+        "critchance":    np.array([f.critchance for f in fighter_list], dtype=np.float64),
+        "critmult":      np.array([f.critmult for f in fighter_list], dtype=np.float64),
+        "evasion":       np.array([f.evasion for f in fighter_list], dtype=np.float64),
+        "stamina_regen": np.array([f.stamina_regen for f in fighter_list], dtype=np.int64),
+        "stamina_light": np.array([f.stamina_light for f in fighter_list], dtype=np.int64),
+        "stamina_heavy": np.array([f.stamina_heavy for f in fighter_list], dtype=np.int64),
+        "prob_heavy":    np.array([heavy_attack_chance(f) for f in fighter_list], dtype=np.float64),
+        "inc":           np.array([time_inc_for_speed(f.speed) for f in fighter_list],
+                                  dtype=np.float64),
+    }
+
+
+# run many battles at once (one row per battle)
+def simulate_arrays(side_a, side_b, rng=None):
+    rng = np.random.default_rng(rng)
+    n = len(side_a["max_health"])
+
+    hp = np.stack([side_a["max_health"], side_b["max_health"]]).copy()
+    st = np.stack([side_a["stamina"], side_b["stamina"]]).copy()
+    next_t = np.zeros((2, n), dtype=np.float64)
+    turns = np.zeros(n, dtype=np.int64)
+
+    stats = {k: np.stack([side_a[k], side_b[k]]) for k in side_a}
+
+    active = np.ones(n, dtype=bool)
+    tick = 0
+
+    # loop until every battle is finished
+    while tick < MAX_TICKS:
+        idx = np.flatnonzero(active)
+        if len(idx) == 0:
+            break
+        tick += 1
+        m = len(idx)
+
+        # pick attacker based on timers (0 = fighter1, 1 = fighter2)
+        att = (next_t[0, idx] > next_t[1, idx]).astype(np.int64)
+        dfd = 1 - att
+
+        def s(name, side):
+            return stats[name][side, idx]
+
+        att_st = st[att, idx]
+        turns[idx] += 1
+
+        # choose attack type
+        heavy = rng.random(m) < s("prob_heavy", att)
+        cost = np.where(heavy, s("stamina_heavy", att), s("stamina_light", att))
+        cost = np.maximum(1, cost + rng.integers(-2, 3, size=m))
+        mult = np.where(heavy, 1.6, 1.0)
+        var_lo = np.where(heavy, -3, -1)
+        var_hi = np.where(heavy, 5, 2)
+
+        # exhaustion checks
+        short = att_st < cost
+        tired = short & (att_st >= 2)
+        skip = short & ~tired
+
+        cost = np.where(tired, np.maximum(1, cost // 2), cost)
+        mult = np.where(tired, 0.5, mult)
+        var_lo = np.where(tired, -1, var_lo)
+        var_hi = np.where(tired, 1, var_hi)
+
+        # evasion, variance and crits
+        dodged = rng.random(m) < s("evasion", dfd)
+        variance = rng.integers(var_lo, var_hi + 1)
+        crit = rng.random(m) < s("critchance", att)
+
+        base = np.maximum(0, s("strength", att) - s("defense", dfd) + variance)
+        crit_mult = np.where(crit, s("critmult", att), 1.0)
+        damage = np.maximum(0, (base * mult * crit_mult).astype(np.int64))
+
+        hits = ~skip & ~dodged
+        def_hp = hp[dfd, idx]
+        hp[dfd, idx] = np.where(hits, np.maximum(0, def_hp - damage), def_hp)
+
+        # stamina cost + regen
+        after_cost = np.where(skip, att_st, np.maximum(0, att_st - cost))
+        st[att, idx] = np.minimum(s("stamina", att), after_cost + s("stamina_regen", att))
+        st[dfd, idx] = np.minimum(s("stamina", dfd), st[dfd, idx] + s("stamina_regen", dfd))
+
+        # move attacker timer
+        next_t[att, idx] += s("inc", att)
+
+        active[idx] = (hp[0, idx] > 0) & (hp[1, idx] > 0)
+
+    winners = np.full(n, DRAW, dtype=np.int8)
+    winners[hp[1] <= 0] = FIGHTER1
+    winners[hp[0] <= 0] = FIGHTER2
+    return winners, turns
+
+
+# N battles of one matchup
+def simulate_batch(f1: Fighter, f2: Fighter, n, rng=None):
+    return simulate_arrays(stat_arrays([f1] * n), stat_arrays([f2] * n), rng)
+
+
+# N battles for each (fighter1, fighter2) pair
+def simulate_matchups(pairs, n, rng=None):
+    side_a = stat_arrays([f1 for f1, _ in pairs for _ in range(n)])
+    side_b = stat_arrays([f2 for _, f2 in pairs for _ in range(n)])
+    winners, turns = simulate_arrays(side_a, side_b, rng)
+    return winners.reshape(len(pairs), n), turns.reshape(len(pairs), n)
+
+
+# Preview: batch win rates for every pair in the roster
+if __name__ == "__main__":
+    import time
+    from battle_engine import load_fighters
+
+    fighters = load_fighters()
+    pairs = [(a, b) for a in fighters for b in fighters if a is not b]
+
+    n = 2000
+    start = time.perf_counter()
+    winners, turns = simulate_matchups(pairs, n)
+    elapsed = time.perf_counter() - start
+
+    print(f"Simulated {len(pairs) * n} battles in {elapsed:.2f}s\n")
+    for (a, b), w, t in zip(pairs, winners, turns):
+        print(f"{a.name:>10} vs {b.name:<10} {np.mean(w == FIGHTER1):6.1%}  "
+              f"avg turns {t.mean():5.1f}")
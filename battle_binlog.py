@@ -0,0 +1,283 @@
+# battle_binlog.py
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import battle_db
+from battle_engine import MoveRecorder, MOVE_COLUMNS, ATTACK_TYPES, ATTACK_CODES
+from battle_compact import NameTable, names_path, read_moves_csv
+
+# MoveRecorder's packed record, as a numpy dtype
+RECORDER_DTYPE = np.dtype([(col, "<" + code) for col, code in MoveRecorder.FIELDS])
+
+# one move on disk: fighter names / attack types as codes
+# (time stays float64: it is a running clock and float32 would round it;
+# battle_id and fighter codes are as wide as MoveRecorder's, so none can overflow)
+MOVE_DTYPE = np.dtype([
+    ("battle_id", "<i8"), ("time", "<f8"), ("turn", "<i4"),
+    ("attacker", "<i4"), ("defender", "<i4"), ("attack_type", "i1"),
+    ("stamina_cost", "<i4"), ("attacker_stamina_before", "<i4"),
+    ("attacker_stamina_after_cost", "<i4"), ("attacker_stamina_after", "<i4"),
+    ("defender_health_before", "<i4"), ("defender_health_after", "<i4"),
+    ("hit", "?"), ("damage_dealt", "<i4"), ("critical", "?"),
+])
+
+# sidecar index: where each battle's records start and how many there are
+INDEX_DTYPE = np.dtype([("battle_id", "<i8"), ("start", "<i8"), ("count", "<i4")])
+
+
+def index_path(path):
+    return path + ".idx"
+
+
+def _memmap(path, dtype):
+    if not os.path.exists(path) or os.path.getsize(path) < dtype.itemsize:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r",
+                     shape=(os.path.getsize(path) // dtype.itemsize,))
+
+
+# logs opened in this process: path -> (file stamps, BinaryLog)
+_logs = {}
+
+
+def _stamp(path):
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+# the log at `path`, opened once and reopened only after it (its index or names)
+# changed on disk
+def open_log(path):
+    stamp = tuple(_stamp(p) for p in (path, index_path(path), names_path(path)))
+    cached = _logs.get(path)
+    if cached is None or cached[0] != stamp:
+        cached = _logs[path] = (stamp, BinaryLog(path))
+    return cached[1]
+
+
+# records -> MoveRecorder, keeping the file's fighter codes
+def to_recorder(recs, names):
+    moves = MoveRecorder()
+    for name in names:
+        moves.code(name)
+    moves.buffer = bytearray(np.asarray(recs).astype(RECORDER_DTYPE).tobytes())
+    return moves
+
+
+# Append-only writer for the binary log (records, index and fighter names)
+class BinaryLogWriter:
+
+    def __init__(self, path):
+        self.path = path
+        self.name_table = NameTable(path)
+        self.names = self.name_table.names
+
+    # file-wide fighter code (new names are appended to the .names file)
+    def code(self, name):
+        return self.name_table.code(name)
+
+    # move rows in the legacy columns -> records
+    def frame_records(self, df):
+        recs = np.empty(len(df), dtype=MOVE_DTYPE)
+        for col in MOVE_DTYPE.names:
+            if col in ("attacker", "defender"):
+                recs[col] = [self.code(name) for name in df[col]]
+            elif col == "attack_type":
+                recs[col] = df[col].map(ATTACK_CODES).to_numpy()
+            else:
+                recs[col] = df[col].to_numpy()
+        return recs
+
+    # records first, then their index entries (a battle is only indexed once complete)
+    def append(self, recs):
+        if len(recs) == 0:
+            return
+        first = os.path.getsize(self.path) // MOVE_DTYPE.itemsize \
+            if os.path.exists(self.path) else 0
+
+        ids = recs["battle_id"]
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(ids)) + 1])
+        index = np.empty(len(starts), dtype=INDEX_DTYPE)
+        index["battle_id"] = ids[starts]
+        index["start"] = first + starts
+        index["count"] = np.diff(np.append(starts, len(recs)))
+
+        with open(self.path, "ab") as fh:
+            fh.write(recs.tobytes())
+        with open(index_path(self.path), "ab") as fh:
+            fh.write(index.tobytes())
+
+
+# Read-only view of the binary log; records stay on disk (numpy.memmap)
+class BinaryLog:
+
+    def __init__(self, path):
+        self.path = path
+        self.names = NameTable(path).names
+        self.records = _memmap(path, MOVE_DTYPE)
+        self.index = _memmap(index_path(path), INDEX_DTYPE)
+        self._sorted = None
+
+        # a log written with another record layout doesn't line up with its index
+        if len(self.index) and self.index["start"][-1] + self.index["count"][-1] != len(self):
+            raise ValueError(f"{path} does not match its index (older record layout?); "
+                             "re-export it with python battle_binlog.py")
+
+    def __len__(self):
+        return len(self.records)
+
+    # index battle_ids in sorted order, and the entry each came from (stable, so
+    # repeated IDs keep file order); sorted once per opened log
+    def sorted_ids(self):
+        if self._sorted is None:
+            ids = np.asarray(self.index["battle_id"])
+            order = np.argsort(ids, kind="stable")
+            self._sorted = ids[order], order
+        return self._sorted
+
+    # (start, count) of a battle's records, or None; the first entry wins for
+    # repeated IDs, joined with the entries right after it when a write split
+    # the battle across two of them
+    def span(self, battle_id):
+        ids, order = self.sorted_ids()
+        k = int(np.searchsorted(ids, battle_id))
+        if k == len(ids) or ids[k] != battle_id:
+            return None
+        start, count = int(self.index["start"][order[k]]), int(self.index["count"][order[k]])
+        for k in range(k + 1, len(ids)):
+            entry = self.index[order[k]]
+            if ids[k] != battle_id or entry["start"] != start + count:
+                break
+            count += int(entry["count"])
+        return start, count
+
+    def __contains__(self, battle_id):
+        return self.span(battle_id) is not None
+
+    # one battle's records (a view into the file, no copy), or None
+    def battle(self, battle_id):
+        span = self.span(battle_id)
+        if span is None:
+            return None
+        start, count = span
+        return self.records[start:start + count]
+
+    # one battle as a MoveRecorder (messages, row dicts, replay), or None
+    def recorder(self, battle_id):
+        recs = self.battle(battle_id)
+        return None if recs is None else to_recorder(recs, self.names)
+
+    # records [start:stop] as a DataFrame with the CSV's columns and dtypes
+    # fighter: keep only moves of battles that fighter took part in
+    def frame(self, columns=None, fighter=None, start=0, stop=None):
+        recs = self.records[start:stop]
+        if fighter is not None:
+            if fighter not in self.names:
+                recs = recs[:0]
+            else:
+                code = self.names.index(fighter)
+                recs = recs[(recs["attacker"] == code) | (recs["defender"] == code)]
+
+        names = np.array(self.names, dtype=object)
+        kinds = np.array(ATTACK_TYPES, dtype=object)
+        data = {}
+        for col in (columns or MOVE_COLUMNS):
+            if col in ("attacker", "defender"):
+                data[col] = names[recs[col]]
+            elif col == "attack_type":
+                data[col] = kinds[recs[col]]
+            elif col == "message":
+                data[col] = to_recorder(recs, self.names).columns()["message"]
+            elif recs.dtype[col].kind == "i":
+                data[col] = recs[col].astype(np.int64)
+            else:
+                data[col] = np.asarray(recs[col])
+        return pd.DataFrame(data)
+
+    # stream the whole log in DataFrames of chunk_rows moves
+    def chunks(self, chunk_rows=1_000_000, columns=None, fighter=None):
+        for start in range(0, len(self.records), chunk_rows):
+            yield self.frame(columns, fighter, start, start + chunk_rows)
+
+
+def write_frames(frames, path):
+    writer = BinaryLogWriter(path)
+    for df in frames:
+        writer.append(writer.frame_records(df))
+    return writer
+
+
+# copy an existing battle_moves.csv into a binary log
+def convert_csv(moves_path, path, chunk_rows=1_000_000):
+    return write_frames(read_moves_csv(moves_path, chunk_rows=chunk_rows), path)
+
+
+# move columns the log stores (messages are rebuilt from the records)
+RECORD_COLUMNS = [c for c in MOVE_COLUMNS if c != "message"]
+
+
+# (re)write the log, its index and names from the moves in battles.db; the old
+# files are replaced only once the new ones are complete
+def export(conn, path, chunk_rows=1_000_000):
+    tmp = path + ".tmp"
+    parts = [index_path, names_path]
+    for p in [tmp] + [part(tmp) for part in parts]:
+        if os.path.exists(p):
+            os.remove(p)
+    top = battle_db.top_rowid(conn, "moves")
+    write_frames(battle_db.read_moves(conn, RECORD_COLUMNS, rowids=(0, top),
+                                      chunk_rows=chunk_rows), tmp)
+    for part in parts:
+        if os.path.exists(part(tmp)):
+            os.replace(part(tmp), part(path))
+    if os.path.exists(tmp):
+        os.replace(tmp, path)
+    battle_db.set_export_mark(conn, path, top)
+
+
+# append the moves saved since the last write (a full export if the log was
+# never written from this database)
+def append(conn, path, chunk_rows=1_000_000):
+    mark = battle_db.export_mark(conn, path)
+    if mark is None:
+        export(conn, path, chunk_rows)
+        return
+    top = battle_db.top_rowid(conn, "moves")
+    if top <= mark:
+        return
+    write_frames(battle_db.read_moves(conn, RECORD_COLUMNS, rowids=(mark, top),
+                                      chunk_rows=chunk_rows), path)
+    battle_db.set_export_mark(conn, path, top)
+
+
+# python battle_binlog.py [battle_id]  -> export battles.db's moves to
+# battle_moves.bin, then time a full scan and a single-battle seek
+if __name__ == "__main__":
+    from battle_store import database, BINLOG_PATH
+
+    start = time.perf_counter()
+    export(database(), BINLOG_PATH)
+    print(f"Exported to {BINLOG_PATH} in {time.perf_counter() - start:.2f}s")
+
+    log = BinaryLog(BINLOG_PATH)
+    start = time.perf_counter()
+    total = int(log.records["damage_dealt"].sum())
+    print(f"Scanned {len(log)} moves ({total} damage) in {time.perf_counter() - start:.3f}s")
+
+    battle_id = int(sys.argv[1]) if len(sys.argv) > 1 else int(log.index["battle_id"][-1])
+    start = time.perf_counter()
+    moves = log.recorder(battle_id)
+    elapsed = time.perf_counter() - start
+    if moves is None:
+        print(f"Battle {battle_id} is not in the log.")
+    else:
+        print(f"Battle {battle_id}: {len(moves)} moves in {elapsed * 1000:.2f} ms")
+        for m in moves:
+            print(m["message"])
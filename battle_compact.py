@@ -0,0 +1,186 @@
+# battle_compact.py
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from battle_engine import MoveRecorder, MOVE_COLUMNS, ATTACK_TYPES, ATTACK_CODES, SKIP
+
+# what a compact moves file stores: names / attack types as codes, hit / critical as 0/1
+COMPACT_COLUMNS = [
+    "battle_id", "time", "turn", "attacker", "defender", "attack_type",
+    "stamina_cost", "attacker_stamina_before", "attacker_stamina_after",
+    "defender_health_before", "hit", "damage_dealt", "critical",
+]
+
+# legacy columns rebuilt on read, and the stored columns each one needs
+DERIVED = {
+    "attacker_stamina_after_cost": ["attacker_stamina_before", "stamina_cost"],
+    "defender_health_after": ["defender_health_before", "damage_dealt"],
+    "message": ["attacker", "defender", "attack_type", "hit", "damage_dealt", "critical"],
+}
+
+
+def names_path(path):
+    return path + ".names"
+
+
+# fighter name <-> code, kept in an append-only sidecar file (one name per line)
+class NameTable:
+
+    def __init__(self, path):
+        self.path = names_path(path)
+        self.names = []
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as fh:
+                self.names = fh.read().splitlines()
+        self._codes = {name: i for i, name in enumerate(self.names)}
+
+    def code(self, name):
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self.names)
+            self.names.append(name)
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(name + "\n")
+        return code
+
+    # codes -> names, for a whole column at once
+    def decode(self, codes):
+        return np.array(self.names, dtype=object)[np.asarray(codes, dtype=np.int64)]
+
+
+def is_compact(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return False
+    with open(path, encoding="utf-8") as fh:
+        return fh.readline().strip() == ",".join(COMPACT_COLUMNS)
+
+
+# compact columns (name -> list) for a MoveRecorder or a list of move dicts
+def encode(move_log, names: NameTable):
+    if isinstance(move_log, MoveRecorder):
+        idx = MoveRecorder.INDEX
+        recs = list(move_log.records())
+        remap = [names.code(n) for n in move_log.names]
+        cols = {}
+        for col in COMPACT_COLUMNS:
+            k = idx[col]
+            if col in ("attacker", "defender"):
+                cols[col] = [remap[r[k]] for r in recs]
+            elif col in ("hit", "critical"):
+                cols[col] = [int(r[k]) for r in recs]
+            else:
+                cols[col] = [r[k] for r in recs]
+        return cols
+
+    df = compact_frame(pd.DataFrame(list(move_log), columns=MOVE_COLUMNS), names)
+    return {col: df[col].tolist() for col in COMPACT_COLUMNS}
+
+
+# legacy move frame -> compact frame
+def compact_frame(df, names: NameTable):
+    out = pd.DataFrame(index=df.index)
+    for col in COMPACT_COLUMNS:
+        if col in ("attacker", "defender"):
+            codes = {name: names.code(name) for name in pd.unique(df[col])}
+            out[col] = df[col].map(codes).astype(np.int64)
+        elif col == "attack_type":
+            out[col] = df[col].map(ATTACK_CODES).astype(np.int64)
+        elif col in ("hit", "critical"):
+            out[col] = df[col].astype(bool).astype(np.int64)
+        else:
+            out[col] = df[col]
+    return out
+
+
+# compact columns needed to produce the requested legacy columns
+def source_columns(columns=None):
+    wanted = MOVE_COLUMNS if columns is None else columns
+    cols = set()
+    for col in wanted:
+        cols.update(DERIVED.get(col, [col]))
+    return [c for c in COMPACT_COLUMNS if c in cols]
+
+
+# compact frame -> legacy columns (all of them, or just the requested ones)
+def expand(df, names: NameTable, columns=None):
+    wanted = MOVE_COLUMNS if columns is None else list(columns)
+    out = {}
+    for col in wanted:
+        if col in ("attacker", "defender"):
+            out[col] = names.decode(df[col])
+        elif col == "attack_type":
+            out[col] = np.array(ATTACK_TYPES, dtype=object)[df[col].to_numpy()]
+        elif col in ("hit", "critical"):
+            out[col] = df[col].to_numpy().astype(bool)
+        elif col == "attacker_stamina_after_cost":
+            out[col] = np.maximum(0, df["attacker_stamina_before"] - df["stamina_cost"])
+        elif col == "defender_health_after":
+            out[col] = np.maximum(0, df["defender_health_before"] - df["damage_dealt"])
+        elif col == "message":
+            out[col] = messages(df, names)
+        else:
+            out[col] = df[col].to_numpy()
+    return pd.DataFrame(out, index=df.index)
+
+
+# battle messages, built column-wise (same text as MoveRecorder.message)
+def messages(df, names: NameTable):
+    att = pd.Series(names.decode(df["attacker"]), index=df.index)
+    dfd = pd.Series(names.decode(df["defender"]), index=df.index)
+    kind = pd.Series(np.array(ATTACK_TYPES, dtype=object)[df["attack_type"].to_numpy()],
+                     index=df.index)
+    crit = np.where(df["critical"].to_numpy().astype(bool), " (CRIT)", "")
+
+    hit_msg = att + " uses " + kind + " on " + dfd + " for " + \
+        df["damage_dealt"].astype(str) + crit + "!"
+    msg = np.where(df["hit"].to_numpy().astype(bool), hit_msg, dfd + " dodges " + att + "!")
+    msg = np.where(df["attack_type"].to_numpy() == SKIP, att + " is exhausted and rests.", msg)
+    return msg
+
+
+# read a moves CSV in either schema, always returning legacy columns
+# chunk_rows: yield frames of that many rows instead of one frame
+def read_moves_csv(path, columns=None, chunk_rows=None):
+    if not is_compact(path):
+        return pd.read_csv(path, usecols=columns, chunksize=chunk_rows)
+
+    names = NameTable(path)
+    wanted = MOVE_COLUMNS if columns is None else list(columns)
+    reader = pd.read_csv(path, usecols=source_columns(wanted), chunksize=chunk_rows)
+    if chunk_rows is None:
+        return expand(reader, names, wanted)
+    return (expand(chunk, names, wanted) for chunk in reader)
+
+
+# rewrite a legacy moves CSV in the compact schema (atomic replace)
+def convert_csv(path, chunk_rows=1_000_000):
+    if is_compact(path):
+        return
+    tmp = path + ".tmp"
+    names = NameTable(path)
+    header = True
+    for df in pd.read_csv(path, chunksize=chunk_rows):
+        compact_frame(df, names).to_csv(tmp, index=False, mode="w" if header else "a",
+                                        header=header)
+        header = False
+    os.replace(tmp, path)
+
+
+# python battle_compact.py  -> convert battle_moves.csv to the compact schema
+if __name__ == "__main__":
+    from battle_store import MOVES_PATH
+
+    if not os.path.exists(MOVES_PATH):
+        sys.exit("battle_moves.csv missing — run battles first.")
+
+    before = os.path.getsize(MOVES_PATH)
+    start = time.perf_counter()
+    convert_csv(MOVES_PATH)
+    after = os.path.getsize(MOVES_PATH)
+    print(f"{before / 1e6:.1f} MB -> {after / 1e6:.1f} MB "
+          f"in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,716 @@
+# battle_db.py
+
+import os
+import sys
+import csv
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from battle_engine import MOVE_COLUMNS
+from battle_compact import (
+    COMPACT_COLUMNS, NameTable, encode, compact_frame, expand, source_columns, is_compact,
+    read_moves_csv,
+)
+
+try:
+    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    SCRIPT_DIR = os.getcwd()
+
+DB_PATH = os.path.join(SCRIPT_DIR, "battles.db")
+
+# every column a results row can carry (part4 rows have the most)
+RESULT_COLUMNS = [
+    "battle_id", "fighter1", "fighter2", "winner", "loser", "winner_hp", "turns",
+    "total_damage_winner", "total_damage_loser", "total_misses", "total_dodges",
+    "crits_winner", "crits_loser", "timestamp", "seed",
+    "moves_winner", "moves_loser", "hits_winner", "hits_loser",
+]
+
+RESULT_TYPES = {
+    "fighter1": "TEXT", "fighter2": "TEXT", "winner": "TEXT", "loser": "TEXT",
+    "timestamp": "TEXT",
+}
+# moves are stored once, in the compact schema (battle_compact.py): fighters as
+# fighter_names codes, attack types as codes, no message or derived columns
+MOVE_TYPES = {"time": "REAL"}
+
+# part6's per-battle, per-fighter features, kept for battles whose results and
+# moves were rolled up by battle_retention.py
+SUMMARY_COLUMNS = [
+    "battle_id", "attacker", "total_damage", "total_hits", "moves_used", "crits",
+    "avg_damage", "opp_hp_left", "win",
+]
+SUMMARY_TYPES = {"attacker": "TEXT", "avg_damage": "REAL"}
+
+EXPORT_CHUNK = 200_000
+
+
+def _table(name, columns, types):
+    cols = ",\n    ".join(f"{c} {types.get(c, 'INTEGER')}" for c in columns)
+    return f"CREATE TABLE IF NOT EXISTS {name} (\n    {cols}\n);"
+
+
+# battle_id is not unique: older results files can repeat IDs
+SCHEMA = "\n".join([
+    _table("results", RESULT_COLUMNS, RESULT_TYPES),
+    "CREATE INDEX IF NOT EXISTS results_battle_id ON results (battle_id);",
+    "CREATE INDEX IF NOT EXISTS results_winner ON results (winner);",
+    "CREATE INDEX IF NOT EXISTS results_loser ON results (loser);",
+    "CREATE INDEX IF NOT EXISTS results_pair ON results (fighter1, fighter2);",
+    _table("moves", COMPACT_COLUMNS, MOVE_TYPES),
+    "CREATE INDEX IF NOT EXISTS moves_battle_id ON moves (battle_id, turn);",
+    "CREATE TABLE IF NOT EXISTS fighter_names (code INTEGER PRIMARY KEY, name TEXT UNIQUE);",
+    "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, next_id INTEGER);",
+    # last results / moves rowid written to each CSV file or move-log copy
+    # (see append_csv, battle_parquet.append, battle_binlog.append)
+    "CREATE TABLE IF NOT EXISTS csv_exports (path TEXT PRIMARY KEY, last_rowid INTEGER);",
+    _table("battle_summaries", SUMMARY_COLUMNS, SUMMARY_TYPES),
+    "CREATE INDEX IF NOT EXISTS battle_summaries_battle_id ON battle_summaries (battle_id);",
+])
+
+# aggregates kept up to date on every insert (rebuild_aggregates recomputes them)
+# fighter_totals: wins / losses from results, moves / hits / damage / crits as attacker
+# from stored moves, or from the results row of a battle kept only by seed;
+# first_win orders fighters for the win-rate curves, step / points drive their
+# decimation (see MAX_POINTS)
+# rolled_*: what rolled-up battles contributed, so rebuild_aggregates can start from it;
+# a fighter's wins / losses there cover its fights up to its last rolled-up one (in
+# results order), the prefix whose win-rate points a rebuild keeps, and `kept` is how
+# many of the results rows still stored fall inside that prefix
+AGGREGATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fighter_totals (
+    fighter TEXT PRIMARY KEY,
+    wins INTEGER DEFAULT 0, losses INTEGER DEFAULT 0,
+    moves INTEGER DEFAULT 0, hits INTEGER DEFAULT 0,
+    damage INTEGER DEFAULT 0, crits INTEGER DEFAULT 0,
+    first_win INTEGER, step INTEGER DEFAULT 1, points INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS matchup_totals (
+    fighter1 TEXT, fighter2 TEXT,
+    battles INTEGER DEFAULT 0, wins1 INTEGER DEFAULT 0, wins2 INTEGER DEFAULT 0,
+    PRIMARY KEY (fighter1, fighter2)
+);
+CREATE TABLE IF NOT EXISTS win_rate_points (
+    fighter TEXT, fight_no INTEGER, win_rate REAL,
+    PRIMARY KEY (fighter, fight_no)
+);
+CREATE TABLE IF NOT EXISTS rolled_fighter_totals (
+    fighter TEXT PRIMARY KEY,
+    wins INTEGER DEFAULT 0, losses INTEGER DEFAULT 0,
+    moves INTEGER DEFAULT 0, hits INTEGER DEFAULT 0,
+    damage INTEGER DEFAULT 0, crits INTEGER DEFAULT 0,
+    first_win INTEGER, step INTEGER DEFAULT 1, kept INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS rolled_matchup_totals (
+    fighter1 TEXT, fighter2 TEXT,
+    battles INTEGER DEFAULT 0, wins1 INTEGER DEFAULT 0, wins2 INTEGER DEFAULT 0,
+    PRIMARY KEY (fighter1, fighter2)
+);
+"""
+
+# most win-rate points kept per fighter; past that every other point is dropped
+MAX_POINTS = 2000
+
+
+# open (and create if needed) the database in WAL mode
+def connect(path=DB_PATH):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    legacy = _set_aside_legacy_moves(conn)
+    conn.executescript(SCHEMA)
+    conn.executescript(AGGREGATE_SCHEMA)
+    if legacy:
+        _migrate_moves(conn)
+    # results from before a column was added get it (empty) and the aggregates
+    # are cleared, so they are rebuilt with it (see battle_store.database)
+    if _add_columns(conn, "results", {c: RESULT_TYPES.get(c, "INTEGER") for c in RESULT_COLUMNS}):
+        with conn:
+            conn.execute("DELETE FROM fighter_totals")
+    _add_columns(conn, "rolled_fighter_totals", {"kept": "INTEGER DEFAULT 0"})
+    return conn
+
+
+# add the columns (name -> type) a table from an older version lacks;
+# True if any were added
+def _add_columns(conn, table, types):
+    have = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    missing = [c for c in types if c not in have]
+    with conn:
+        for c in missing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {c} {types[c]}")
+    return bool(missing)
+
+
+# a moves table in the old full-column layout is renamed to moves_legacy
+# (True while there is one to migrate)
+def _set_aside_legacy_moves(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(moves)")]
+    if "message" in columns:
+        conn.execute("DROP INDEX IF EXISTS moves_battle_id")
+        conn.execute("ALTER TABLE moves RENAME TO moves_legacy")
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                        "AND name = 'moves_legacy'").fetchone() is not None
+
+
+# copy moves_legacy into the compact moves table, in one transaction
+def _migrate_moves(conn):
+    codes = FighterCodes(conn)
+    with conn:
+        for df in pd.read_sql_query("SELECT * FROM moves_legacy ORDER BY rowid", conn,
+                                    chunksize=EXPORT_CHUNK):
+            compact_frame(df, codes).to_sql("moves", conn, if_exists="append", index=False)
+        conn.execute("DROP TABLE moves_legacy")
+    conn.execute("VACUUM")
+
+
+# fighter name <-> code for the moves table, kept in fighter_names; same
+# code / decode interface as battle_compact.NameTable
+class FighterCodes:
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._load()
+
+    def _load(self):
+        rows = self.conn.execute("SELECT code, name FROM fighter_names").fetchall()
+        self._codes = {name: code for code, name in rows}
+        self.names = np.empty(max((code for code, _ in rows), default=-1) + 1, dtype=object)
+        for code, name in rows:
+            self.names[code] = name
+
+    # code of a known fighter, or None
+    def find(self, name):
+        return self._codes.get(name)
+
+    def code(self, name):
+        code = self._codes.get(name)
+        if code is None:
+            self.conn.execute("INSERT OR IGNORE INTO fighter_names (name) VALUES (?)", (name,))
+            self._load()
+            code = self._codes[name]
+        return code
+
+    # codes -> names, for a whole column at once
+    def decode(self, codes):
+        codes = np.asarray(codes, dtype=np.int64)
+        if len(codes) and codes.max() >= len(self.names):
+            self._load()
+        return self.names[codes]
+
+
+def is_empty(conn):
+    for table in ("results", "moves"):
+        if conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+            return False
+    return True
+
+
+# numpy scalars (e.g. from DataFrame sums) -> plain Python values
+def _value(v):
+    return v.item() if hasattr(v, "item") else v
+
+
+# insert results rows (dicts) and update the aggregates, in one transaction
+def insert_results(conn, rows):
+    values = [tuple(_value(r.get(c)) for c in RESULT_COLUMNS) for r in rows]
+    if not values:
+        return
+    marks = ", ".join("?" * len(RESULT_COLUMNS))
+    with conn:
+        conn.executemany(
+            f"INSERT INTO results ({', '.join(RESULT_COLUMNS)}) VALUES ({marks})", values
+        )
+        add_results(conn, [dict(zip(RESULT_COLUMNS, v)) for v in values])
+
+
+# insert a MoveRecorder or a list of move dicts and update the aggregates,
+# in one transaction
+def insert_moves(conn, move_log):
+    codes = FighterCodes(conn)
+    cols = encode(move_log, codes)
+    values = [tuple(_value(v) for v in row) for row in zip(*(cols[c] for c in COMPACT_COLUMNS))]
+    marks = ", ".join("?" * len(COMPACT_COLUMNS))
+    with conn:
+        conn.executemany(
+            f"INSERT INTO moves ({', '.join(COMPACT_COLUMNS)}) VALUES ({marks})", values
+        )
+        add_moves(conn, values, codes)
+
+
+# fold new results rows into fighter_totals, matchup_totals and win_rate_points
+# skip: fighter -> how many of its next fights to leave out of its wins / losses
+# and curve (fights inside its rolled-up prefix); used up as rows are read
+def add_results(conn, rows, skip=None):
+    names = {r["winner"] for r in rows} | {r["loser"] for r in rows}
+    marks = ", ".join("?" * len(names))
+    state = {name: [0, 0, None, 1, 0] for name in names}
+    for name, *values in conn.execute(
+        "SELECT fighter, wins, losses, first_win, step, points FROM fighter_totals "
+        f"WHERE fighter IN ({marks})", list(names)
+    ):
+        state[name] = values
+    next_order = conn.execute("SELECT COALESCE(MAX(first_win), 0) + 1 "
+                              "FROM fighter_totals").fetchone()[0]
+    matchups = {}
+
+    for r in rows:
+        key = (r["fighter1"], r["fighter2"])
+        battles, wins1, wins2 = matchups.get(key, (0, 0, 0))
+        matchups[key] = (battles + 1, wins1 + (r["winner"] == r["fighter1"]),
+                         wins2 + (r["winner"] == r["fighter2"]))
+
+        for name, won in ((r["winner"], 1), (r["loser"], 0)):
+            if skip and skip.get(name):
+                skip[name] -= 1
+                continue
+            st = state[name]
+            st[0] += won
+            st[1] += 1 - won
+            if won and st[2] is None:
+                st[2] = next_order
+                next_order += 1
+
+            # cumulative win-rate curve, one point every `step` fights
+            n = st[0] + st[1]
+            if n % st[3] == 0:
+                conn.execute("INSERT OR REPLACE INTO win_rate_points VALUES (?, ?, ?)",
+                             (name, n, st[0] / n * 100))
+                st[4] += 1
+                if st[4] > MAX_POINTS:
+                    st[3] *= 2
+                    conn.execute("DELETE FROM win_rate_points WHERE fighter = ? "
+                                 "AND fight_no % ? != 0", (name, st[3]))
+                    st[4] = conn.execute("SELECT COUNT(*) FROM win_rate_points "
+                                         "WHERE fighter = ?", (name,)).fetchone()[0]
+
+    conn.executemany(
+        "INSERT INTO fighter_totals (fighter, wins, losses, first_win, step, points) "
+        "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (fighter) DO UPDATE SET "
+        "wins = excluded.wins, losses = excluded.losses, first_win = excluded.first_win, "
+        "step = excluded.step, points = excluded.points",
+        [(name, *st) for name, st in state.items()]
+    )
+    conn.executemany(
+        "INSERT INTO matchup_totals VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (fighter1, fighter2) DO UPDATE SET "
+        "battles = battles + excluded.battles, wins1 = wins1 + excluded.wins1, "
+        "wins2 = wins2 + excluded.wins2",
+        [(*key, *counts) for key, counts in matchups.items()]
+    )
+    conn.executemany(
+        "INSERT INTO fighter_totals (fighter, moves, hits, damage, crits) "
+        f"VALUES (?, ?, ?, ?, ?) {MOVE_TOTALS_UPSERT}",
+        [(name, *t) for name, t in seed_only_totals(conn, rows).items()]
+    )
+
+
+# fighter -> [moves, hits, damage, crits] from results rows that carry move
+# totals, for battles with no stored moves (moves are saved before their results,
+# so stored moves are already counted by add_moves)
+def seed_only_totals(conn, rows):
+    totals = {}
+    for r in rows:
+        if r["moves_winner"] is None or conn.execute(
+            "SELECT 1 FROM moves WHERE battle_id = ? LIMIT 1", (r["battle_id"],)
+        ).fetchone():
+            continue
+        for side in ("winner", "loser"):
+            t = totals.setdefault(r[side], [0, 0, 0, 0])
+            t[0] += r[f"moves_{side}"]
+            t[1] += r[f"hits_{side}"]
+            t[2] += r[f"total_damage_{side}"]
+            t[3] += r[f"crits_{side}"]
+    return totals
+
+
+MOVE_TOTALS_UPSERT = (
+    "ON CONFLICT (fighter) DO UPDATE SET moves = moves + excluded.moves, "
+    "hits = hits + excluded.hits, damage = damage + excluded.damage, "
+    "crits = crits + excluded.crits"
+)
+
+
+# fold new move rows (tuples in COMPACT_COLUMNS order) into fighter_totals
+def add_moves(conn, values, codes):
+    att, hit = COMPACT_COLUMNS.index("attacker"), COMPACT_COLUMNS.index("hit")
+    dmg, crit = COMPACT_COLUMNS.index("damage_dealt"), COMPACT_COLUMNS.index("critical")
+    totals = {}
+    for v in values:
+        t = totals.setdefault(v[att], [0, 0, 0, 0])
+        t[0] += 1
+        t[1] += bool(v[hit])
+        t[2] += v[dmg]
+        t[3] += bool(v[crit])
+    conn.executemany(
+        "INSERT INTO fighter_totals (fighter, moves, hits, damage, crits) "
+        f"VALUES (?, ?, ?, ?, ?) {MOVE_TOTALS_UPSERT}",
+        [(codes.names[code], *t) for code, t in totals.items()]
+    )
+
+
+def aggregates_stale(conn):
+    empty = conn.execute("SELECT 1 FROM fighter_totals LIMIT 1").fetchone() is None
+    return empty and not is_empty(conn)
+
+
+# recompute every aggregate table from the raw results and moves, starting from
+# the rolled-up totals (win-rate points up to each fighter's rolled-up prefix are
+# kept as is, and the stored fights inside it are not replayed onto the curve)
+def rebuild_aggregates(conn, chunk_rows=EXPORT_CHUNK):
+    with conn:
+        for table in ("fighter_totals", "matchup_totals"):
+            conn.execute(f"DELETE FROM {table}")
+        conn.execute(
+            "DELETE FROM win_rate_points WHERE fight_no > COALESCE((SELECT r.wins + r.losses "
+            "FROM rolled_fighter_totals r WHERE r.fighter = win_rate_points.fighter), 0)"
+        )
+        conn.execute(
+            "INSERT INTO fighter_totals "
+            "SELECT r.fighter, r.wins, r.losses, r.moves, r.hits, r.damage, r.crits, "
+            "r.first_win, r.step, (SELECT COUNT(*) FROM win_rate_points p "
+            "WHERE p.fighter = r.fighter) FROM rolled_fighter_totals r"
+        )
+        conn.execute("INSERT INTO matchup_totals SELECT * FROM rolled_matchup_totals")
+        skip = dict(conn.execute("SELECT fighter, kept FROM rolled_fighter_totals "
+                                 "WHERE kept > 0"))
+
+        cur = conn.execute(f"SELECT {', '.join(RESULT_COLUMNS)} FROM results ORDER BY rowid")
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            add_results(conn, [dict(zip(RESULT_COLUMNS, r)) for r in rows], skip)
+
+        conn.execute(
+            "INSERT INTO fighter_totals (fighter, moves, hits, damage, crits) "
+            "SELECT n.name, COUNT(*), SUM(m.hit), SUM(m.damage_dealt), SUM(m.critical) "
+            "FROM moves m JOIN fighter_names n ON n.code = m.attacker "
+            f"WHERE true GROUP BY m.attacker {MOVE_TOTALS_UPSERT}"
+        )
+
+
+# stored battle summaries as a DataFrame (see SUMMARY_COLUMNS)
+def summaries_frame(conn):
+    return pd.read_sql_query(
+        f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM battle_summaries ORDER BY rowid", conn
+    )
+
+
+# per-fighter totals as a DataFrame
+def fighter_table(conn):
+    return pd.read_sql_query(
+        "SELECT fighter, wins, losses, moves, hits, damage, crits FROM fighter_totals "
+        "ORDER BY fighter", conn
+    )
+
+
+# per-matchup win counts as a DataFrame
+def matchup_table(conn):
+    return pd.read_sql_query(
+        "SELECT * FROM matchup_totals ORDER BY fighter1, fighter2", conn
+    )
+
+
+# fighter -> (fight numbers, win rate %), fighters in the order they first won;
+# every curve ends at that fighter's latest fight
+def win_rate_curves(conn):
+    curves = {}
+    fighters = conn.execute(
+        "SELECT fighter, wins, losses FROM fighter_totals "
+        "WHERE first_win IS NOT NULL ORDER BY first_win"
+    ).fetchall()
+    for name, wins, losses in fighters:
+        pts = conn.execute("SELECT fight_no, win_rate FROM win_rate_points "
+                           "WHERE fighter = ? ORDER BY fight_no", (name,)).fetchall()
+        xs = [n for n, _ in pts]
+        ys = [rate for _, rate in pts]
+        n = wins + losses
+        if not xs or xs[-1] != n:
+            xs.append(n)
+            ys.append(wins / n * 100)
+        curves[name] = (np.array(xs), np.array(ys))
+    return curves
+
+
+def next_battle_id(conn):
+    top = conn.execute("SELECT MAX(battle_id) FROM results").fetchone()[0]
+    return 1 if top is None else top + 1
+
+
+# highest battle_id with a results row or stored moves (0 if none)
+def last_battle_id(conn):
+    top = conn.execute(
+        "SELECT MAX(top) FROM (SELECT MAX(battle_id) AS top FROM results "
+        "UNION ALL SELECT MAX(battle_id) FROM moves)"
+    ).fetchone()[0]
+    return top or 0
+
+
+# stored moves in the legacy columns (all, or the requested ones), in insertion
+# order, as frames of up to chunk_rows rows
+# after: only battles with a higher battle_id; fighter: only battles that fighter
+# took part in; rowids: only rows with lo < rowid <= hi
+def read_moves(conn, columns=None, after=None, fighter=None, rowids=None,
+               chunk_rows=EXPORT_CHUNK):
+    codes = FighterCodes(conn)
+    wanted = MOVE_COLUMNS if columns is None else list(columns)
+    where, params = ["true"], []
+    if after is not None:
+        where.append("battle_id > ?")
+        params.append(after)
+    if fighter is not None:
+        code = codes.find(fighter)
+        if code is None:
+            return
+        where.append("(attacker = ? OR defender = ?)")
+        params += [code, code]
+    if rowids is not None:
+        where.append("rowid > ? AND rowid <= ?")
+        params += list(rowids)
+
+    for df in pd.read_sql_query(
+        f"SELECT {', '.join(source_columns(wanted))} FROM moves "
+        f"WHERE {' AND '.join(where)} ORDER BY rowid", conn, params=params, chunksize=chunk_rows
+    ):
+        if len(df):
+            yield expand(df, codes, wanted)
+
+
+# seeded results rows (dicts) of battles with no stored moves, in chunks of
+# chunk_rows; after / fighter as in read_moves
+def unstored_results(conn, after=None, fighter=None, chunk_rows=EXPORT_CHUNK):
+    where, params = ["seed IS NOT NULL"], []
+    if after is not None:
+        where.append("battle_id > ?")
+        params.append(after)
+    if fighter is not None:
+        where.append("(fighter1 = ? OR fighter2 = ?)")
+        params += [fighter, fighter]
+    cur = conn.execute(
+        f"SELECT {', '.join(RESULT_COLUMNS)} FROM results r WHERE {' AND '.join(where)} "
+        "AND NOT EXISTS (SELECT 1 FROM moves m WHERE m.battle_id = r.battle_id) "
+        "ORDER BY rowid", params
+    )
+    while True:
+        rows = cur.fetchmany(chunk_rows)
+        if not rows:
+            return
+        yield [dict(zip(RESULT_COLUMNS, row)) for row in rows]
+
+
+# winner / loser and their move counts from the results rows that carry move
+# totals and have no stored moves, as frames of up to chunk_rows rows
+def seed_only_moves(conn, chunk_rows=EXPORT_CHUNK):
+    yield from pd.read_sql_query(
+        "SELECT winner, loser, moves_winner, moves_loser FROM results r "
+        "WHERE moves_winner IS NOT NULL "
+        "AND NOT EXISTS (SELECT 1 FROM moves m WHERE m.battle_id = r.battle_id) "
+        "ORDER BY rowid", conn, chunksize=chunk_rows
+    )
+
+
+# claim `count` consecutive battle IDs and return the first one
+# BEGIN IMMEDIATE takes the database write lock, so concurrent runs (other
+# processes included) always get disjoint ranges; results written without a
+# reservation (e.g. imported CSV rows) are skipped over
+def reserve_ids(conn, count=1):
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT next_id FROM counters WHERE name = 'battle'").fetchone()
+        first = max(row[0] if row else 1, next_battle_id(conn))
+        conn.execute("INSERT OR REPLACE INTO counters VALUES ('battle', ?)", (first + count,))
+    return first
+
+
+# first seeded results row for a battle (dict), or None
+def find_result(conn, battle_id):
+    cur = conn.execute(
+        f"SELECT {', '.join(RESULT_COLUMNS)} FROM results "
+        "WHERE battle_id = ? AND seed IS NOT NULL ORDER BY rowid LIMIT 1",
+        (battle_id,)
+    )
+    row = cur.fetchone()
+    return None if row is None else dict(zip(RESULT_COLUMNS, row))
+
+
+# results rows as a DataFrame, integer columns as Int64 (they can be empty)
+def _typed_results(df):
+    for c in df.columns:
+        if RESULT_TYPES.get(c, "INTEGER") == "INTEGER":
+            df[c] = df[c].astype("Int64")
+    return df
+
+
+# results table as a DataFrame (insertion order, unused columns dropped)
+# upto: only rows with rowid <= upto
+def results_frame(conn, upto=None):
+    df = pd.read_sql_query("SELECT * FROM results WHERE rowid <= ? ORDER BY rowid", conn,
+                           params=(upto if upto is not None else top_rowid(conn, "results"),))
+    return _typed_results(df.dropna(axis=1, how="all"))
+
+
+def top_rowid(conn, table):
+    return conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+
+
+# last rowid written to an export (CSV file, Parquet dataset, binary log), or
+# None if it was never exported
+def export_mark(conn, path):
+    row = conn.execute("SELECT last_rowid FROM csv_exports WHERE path = ?",
+                       (os.path.abspath(path),)).fetchone()
+    return None if row is None else row[0]
+
+
+def set_export_mark(conn, path, rowid):
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO csv_exports VALUES (?, ?)",
+                     (os.path.abspath(path), rowid))
+
+
+# forget what was exported where (rowids change on VACUUM), so every export is
+# written in full next time
+def reset_exports(conn):
+    with conn:
+        conn.execute("DELETE FROM csv_exports")
+
+
+# header of an existing CSV file, or None
+def csv_header(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, newline="") as fh:
+        return next(csv.reader(fh), None)
+
+
+def export_results(conn, path):
+    top = top_rowid(conn, "results")
+    tmp = path + ".tmp"
+    results_frame(conn, top).to_csv(tmp, index=False)
+    os.replace(tmp, path)
+    set_export_mark(conn, path, top)
+
+
+# write the moves with lo < rowid <= hi to `out` as CSV rows under `columns`;
+# compact columns are coded with the moves file's NameTable
+def _write_moves(conn, out, columns, rowids, header, names=None):
+    compact = columns == COMPACT_COLUMNS
+    wanted = MOVE_COLUMNS if compact else [c for c in columns if c in MOVE_COLUMNS]
+    for df in read_moves(conn, wanted, rowids=rowids):
+        if compact:
+            df = compact_frame(df, names)
+        df.reindex(columns=columns).to_csv(out, index=False, mode="w" if header else "a",
+                                           header=header)
+        header = False
+    if header:
+        pd.DataFrame(columns=columns).to_csv(out, index=False)
+
+
+# write the whole moves table out in the legacy columns; compact=True (or, by
+# default, a file already in that schema) writes the compact one (battle_compact.py)
+def export_moves(conn, path, compact=None):
+    compact = is_compact(path) if compact is None else compact
+    top = top_rowid(conn, "moves")
+    tmp = path + ".tmp"
+    if compact:
+        _write_moves(conn, tmp, COMPACT_COLUMNS, (0, top), True, NameTable(path))
+    else:
+        _write_moves(conn, tmp, MOVE_COLUMNS, (0, top), True)
+    os.replace(tmp, path)
+    set_export_mark(conn, path, top)
+
+
+# rebuild both CSV files from the database
+def export_csv(conn, results_path, moves_path):
+    export_results(conn, results_path)
+    export_moves(conn, moves_path)
+
+
+# append the results rows inserted since the last export; a full export when the
+# file is missing, was never exported, or lacks a column the new rows fill
+def append_results(conn, path):
+    mark, header = export_mark(conn, path), csv_header(path)
+    if mark is None or header is None:
+        export_results(conn, path)
+        return
+    top = top_rowid(conn, "results")
+    if top <= mark:
+        return
+    df = _typed_results(pd.read_sql_query(
+        "SELECT * FROM results WHERE rowid > ? AND rowid <= ? ORDER BY rowid", conn,
+        params=(mark, top)
+    ))
+    if any(c not in header and df[c].notna().any() for c in df.columns):
+        export_results(conn, path)
+        return
+    df.reindex(columns=header).to_csv(path, index=False, mode="a", header=False)
+    set_export_mark(conn, path, top)
+
+
+# append the moves inserted since the last export, in the file's own columns
+# (a full export when the file is missing or was never exported); battle_store
+# calls this on every save, so the file is written append-only with a stable
+# header and nothing waits in memory to be flushed at exit
+def append_moves(conn, path):
+    mark, header = export_mark(conn, path), csv_header(path)
+    if mark is None or header is None:
+        export_moves(conn, path)
+        return
+    top = top_rowid(conn, "moves")
+    if top <= mark:
+        return
+    names = NameTable(path) if header == COMPACT_COLUMNS else None
+    _write_moves(conn, path, header, (mark, top), False, names)
+    set_export_mark(conn, path, top)
+
+
+# bring both CSV files up to date, writing only what is new
+def append_csv(conn, results_path, moves_path):
+    append_results(conn, results_path)
+    append_moves(conn, moves_path)
+
+
+# load existing CSV files into the database (one-off, for older data); they
+# count as exported up to what was loaded
+def import_csv(conn, results_path, moves_path):
+    if os.path.exists(results_path):
+        df = pd.read_csv(results_path)
+        df = df[[c for c in RESULT_COLUMNS if c in df.columns]]
+        with conn:
+            df.to_sql("results", conn, if_exists="append", index=False)
+        set_export_mark(conn, results_path, top_rowid(conn, "results"))
+
+    if os.path.exists(moves_path):
+        codes = FighterCodes(conn)
+        with conn:
+            for df in read_moves_csv(moves_path, chunk_rows=EXPORT_CHUNK):
+                compact_frame(df, codes).to_sql("moves", conn, if_exists="append", index=False)
+        set_export_mark(conn, moves_path, top_rowid(conn, "moves"))
+
+
+# python battle_db.py export|import|rebuild  -> sync CSV files with battles.db,
+# or recompute the aggregate tables
+if __name__ == "__main__":
+    from battle_store import RESULTS_PATH, MOVES_PATH, fill_move_totals
+
+    conn = connect()
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "export"
+
+    if cmd == "import":
+        if not is_empty(conn):
+            sys.exit("battles.db already has data; refusing to import twice.")
+        import_csv(conn, RESULTS_PATH, MOVES_PATH)
+        fill_move_totals(conn)
+        rebuild_aggregates(conn)
+    elif cmd == "rebuild":
+        fill_move_totals(conn)
+        rebuild_aggregates(conn)
+    else:
+        export_csv(conn, RESULTS_PATH, MOVES_PATH)
+
+    n_results = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    n_moves = conn.execute("SELECT COUNT(*) FROM moves").fetchone()[0]
+    print(f"{cmd}: {n_results} results, {n_moves} moves")
@@ -0,0 +1,539 @@
+# battle_engine.py
+#
+# Headless battle core: Fighter, load_fighters, simulate_battle / simulate_outcome.
+# Keep this module free of pygame / matplotlib / pandas so batch workers
+# can import it in a few milliseconds (see IMPORT_BUDGET_MS below).
+
+import os
+import csv
+import random
+import struct
+from operator import attrgetter
+
+try:
+    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    SCRIPT_DIR = os.getcwd()
+
+CSV_PATH = os.path.join(SCRIPT_DIR, "fighters.csv")
+
+MAX_TICKS = 3000
+
+# import-time budget for a fresh interpreter
+IMPORT_BUDGET_MS = 50
+
+# OS-backed source for battle seeds (safe after fork in pool workers)
+_seed_source = random.SystemRandom()
+
+
+# Class Modifiers: part1 adds them to the base stats (evasion and the stamina
+# values are replaced); the engine itself only reads the class in heavy_attack_chance
+CLASS_MODIFIERS = {
+    "Tank":      {"health": +10, "strength": 0,  "defense": +3, "speed": -2, "stamina": +10,
+                  "evasion": 0.04, "stamina_regen": 2, "stamina_light": 8,  "stamina_heavy": 16},
+    "Warrior":   {"health": +5,  "strength": +2, "defense": +1, "speed": 0,  "stamina": +5,
+                  "evasion": 0.06, "stamina_regen": 2, "stamina_light": 8,  "stamina_heavy": 16},
+    "Mage":      {"health": -5,  "strength": +3, "defense": -2, "speed": +2, "stamina": -5,
+                  "evasion": 0.12, "stamina_regen": 3, "stamina_light": 6,  "stamina_heavy": 12},
+    "Rogue":     {"health": 0,   "strength": +1, "defense": 0,  "speed": +5, "stamina": 0,
+                  "evasion": 0.18, "stamina_regen": 4, "stamina_light": 6,  "stamina_heavy": 12},
+    "Archer":    {"health": 0,   "strength": +2, "defense": 0,  "speed": +3, "stamina": 0,
+                  "evasion": 0.14, "stamina_regen": 3, "stamina_light": 7,  "stamina_heavy": 14},
+    "Berserker": {"health": +10, "strength": +4, "defense": -1, "speed": -1, "stamina": +5,
+                  "evasion": 0.05, "stamina_regen": 2, "stamina_light": 10, "stamina_heavy": 18},
+}
+
+
+# Fighter stat block: parsed once from the csv row, shared by every clone
+class FighterStats:
+
+    __slots__ = (
+        "name", "cls", "max_health", "strength", "defense", "speed", "stamina",
+        "critchance", "critmult", "evasion",
+        "stamina_regen", "stamina_light", "stamina_heavy",
+        "sprite", "sprite_scale",
+    )
+
+    def __init__(self, row: dict):
+        self.name = row.get("name", "Unknown")
+        self.cls = row.get("class", "")
+
+        self.max_health = int(row.get("health", 0))
+        self.strength = int(row.get("strength", 0))
+        self.defense = int(row.get("defense", 0))
+        self.speed = int(row.get("speed", 0))
+        self.stamina = int(row.get("stamina", 0))
+
+        self.critchance = float(row.get("critchance", 0.0))
+        self.critmult = float(row.get("critmult", 1.0))
+        self.evasion = float(row.get("evasion", 0.0))
+
+        self.stamina_regen = int(row.get("stamina_regen", 2))
+        self.stamina_light = int(row.get("stamina_light", 8))
+        self.stamina_heavy = int(row.get("stamina_heavy", 16))
+
+        self.sprite = (row.get("sprite") or "").strip()
+        self.sprite_scale = float(row.get("sprite_scale", 1.0))
+
+
+# Fighter Class: shared stats + the per-battle state (health, current_stamina)
+class Fighter:
+
+    __slots__ = ("stats", "health", "current_stamina")
+
+    def __init__(self, row: dict):
+        self.stats = FighterStats(row)
+        self.health = self.stats.max_health
+        self.current_stamina = self.stats.stamina
+
+    # Reset Stats Before A Battle
+    def reset_for_battle(self):
+        self.health = self.stats.max_health
+        self.current_stamina = self.stats.stamina
+
+    # Is Fighter Alive
+    def is_alive(self) -> bool:
+        return self.health > 0
+
+    # New Fighter on New Battles (shares the stat block, no re-parsing)
+    def clone_for_battle(self) -> "Fighter":
+        clone = Fighter.__new__(Fighter)
+        clone.stats = self.stats
+        clone.health = self.stats.max_health
+        clone.current_stamina = self.stats.stamina
+        return clone
+
+
+# read-only stat attributes (f.strength, f.name, ...) come from the shared block
+for _stat in FighterStats.__slots__:
+    setattr(Fighter, _stat, property(attrgetter("stats." + _stat)))
+del _stat
+
+
+# Move log columns (same order as battle_moves.csv)
+MOVE_COLUMNS = [
+    "battle_id", "time", "turn", "attacker", "defender", "attack_type",
+    "stamina_cost", "attacker_stamina_before", "attacker_stamina_after_cost",
+    "attacker_stamina_after", "defender_health_before", "defender_health_after",
+    "hit", "damage_dealt", "critical", "message",
+]
+
+# simulate_battle log levels
+LOG_LEVELS = ("full", "summary", "outcome")
+
+# attack type codes used by MoveRecorder
+ATTACK_TYPES = ["light attack", "heavy attack", "tired_strike", "skip"]
+ATTACK_CODES = {name: code for code, name in enumerate(ATTACK_TYPES)}
+SKIP = ATTACK_CODES["skip"]
+
+
+# Move log stored as fixed-width typed records in one buffer;
+# row dicts and messages are only built when someone reads them
+class MoveRecorder:
+
+    # (column, struct typecode) for every stored field
+    FIELDS = [
+        ("battle_id", "q"), ("time", "d"), ("turn", "i"),
+        ("attacker", "i"), ("defender", "i"), ("attack_type", "b"),
+        ("stamina_cost", "i"), ("attacker_stamina_before", "i"),
+        ("attacker_stamina_after_cost", "i"), ("attacker_stamina_after", "i"),
+        ("defender_health_before", "i"), ("defender_health_after", "i"),
+        ("hit", "?"), ("damage_dealt", "i"), ("critical", "?"),
+    ]
+    RECORD = struct.Struct("<" + "".join(code for _, code in FIELDS))
+    INDEX = {col: k for k, (col, _) in enumerate(FIELDS)}
+    _pack = RECORD.pack
+
+    def __init__(self):
+        self.names = []
+        self._codes = {}
+        self.buffer = bytearray()
+
+    # interned fighter code
+    def code(self, name):
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    # append one move (fighters as codes from code(), attack type as ATTACK_CODES value)
+    def record(self, battle_id, time, turn, attacker, defender, attack_type, cost,
+               st_before, st_after_cost, st_after, hp_before, hp_after, hit, damage, crit):
+        self.buffer += self._pack(battle_id, time, turn, attacker, defender, attack_type, cost,
+                                  st_before, st_after_cost, st_after, hp_before, hp_after,
+                                  hit, damage, crit)
+
+    # append every move of another recorder
+    def extend(self, other: "MoveRecorder"):
+        remap = [self.code(name) for name in other.names]
+        if remap == list(range(len(remap))):
+            self.buffer += other.buffer
+            return
+        att, dfd = self.INDEX["attacker"], self.INDEX["defender"]
+        for rec in other.records():
+            rec = list(rec)
+            rec[att], rec[dfd] = remap[rec[att]], remap[rec[dfd]]
+            self.buffer += self._pack(*rec)
+
+    # raw record tuples (fields in FIELDS order, fighters / attack types as codes)
+    def records(self):
+        return self.RECORD.iter_unpack(self.buffer)
+
+    def record_at(self, i):
+        return self.RECORD.unpack_from(self.buffer, i * self.RECORD.size)
+
+    # one field of the last move (cheap check for knockouts etc.)
+    def last(self, col):
+        return self.record_at(len(self) - 1)[self.INDEX[col]]
+
+    # the battle message for one raw record
+    def message(self, rec):
+        attacker = self.names[rec[3]]
+        defender = self.names[rec[4]]
+        atk_code = rec[5]
+
+        if atk_code == SKIP:
+            return f"{attacker} is exhausted and rests."
+        if not rec[12]:
+            return f"{defender} dodges {attacker}!"
+        crit = " (CRIT)" if rec[14] else ""
+        return f"{attacker} uses {ATTACK_TYPES[atk_code]} on {defender} for {rec[13]}{crit}!"
+
+    # full move dict for one raw record (same keys as battle_moves.csv)
+    def row(self, rec):
+        row = dict(zip(MOVE_COLUMNS, rec))
+        row["attacker"] = self.names[rec[3]]
+        row["defender"] = self.names[rec[4]]
+        row["attack_type"] = ATTACK_TYPES[rec[5]]
+        row["message"] = self.message(rec)
+        return row
+
+    # column name -> list, ready for pd.DataFrame (messages only if asked for)
+    def columns(self, with_message=True):
+        recs = list(self.records())
+        cols = {}
+        for k, (col, _) in enumerate(self.FIELDS):
+            if col in ("attacker", "defender"):
+                cols[col] = [self.names[r[k]] for r in recs]
+            elif col == "attack_type":
+                cols[col] = [ATTACK_TYPES[r[k]] for r in recs]
+            else:
+                cols[col] = [r[k] for r in recs]
+        if with_message:
+            cols["message"] = [self.message(r) for r in recs]
+        return cols
+
+    def __len__(self):
+        return len(self.buffer) // self.RECORD.size
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("move index out of range")
+        return self.row(self.record_at(i))
+
+    def __iter__(self):
+        for rec in self.records():
+            yield self.row(rec)
+
+
+# Load Fighters From csv (stdlib csv, no pandas):
+def load_fighters(csv_path=CSV_PATH):
+    with open(csv_path, newline="") as fh:
+        rows = [{k: v for k, v in row.items() if v != ""} for row in csv.DictReader(fh)]
+    return [Fighter(row) for row in rows]
+
+
+# speed → time until next turn
+def time_inc_for_speed(speed):
+    return 100.0 / max(1.0, float(speed))
+
+
+# chance of picking a heavy attack
+def heavy_attack_chance(attacker: Fighter):
+    cls = attacker.cls
+    prob_heavy = 0.25
+
+    if cls in ("Warrior", "Berserker"):
+        prob_heavy += 0.15
+    if cls == "Rogue":
+        prob_heavy -= 0.10
+
+    return prob_heavy
+
+
+# a fresh seed for one battle (32 bits so it survives a float CSV column)
+def battle_seed():
+    return _seed_source.getrandbits(32)
+
+
+# choose the attack type (light / heavy); attacker can be a Fighter or its FighterStats
+def choose_attack_type(attacker: Fighter, rng=random):
+    if rng.random() < heavy_attack_chance(attacker):
+        base = attacker.stamina_heavy
+        mult = 1.6
+        variance = (-3, 5)
+        atk_type = "heavy attack"
+    else:
+        base = attacker.stamina_light
+        mult = 1.0
+        variance = (-1, 2)
+        atk_type = "light attack"
+
+    cost = max(1, base + rng.randint(-2, 2))
+    return atk_type, cost, mult, variance
+
+
+# How one battle ended: winner / loser, turns, remaining HP and per-side totals
+# (returned by simulate_outcome at every log level)
+class BattleOutcome:
+
+    # per-fighter counters, counted during the battle loop
+    TOTAL_KEYS = ("moves", "damage", "hits", "crits", "dodges")
+
+    __slots__ = ("names", "hp", "totals", "turns", "side")
+
+    def __init__(self, names, hp, totals, turns):
+        self.names = names      # (fighter1, fighter2)
+        self.hp = hp            # remaining health, same order
+        self.totals = totals    # one dict of TOTAL_KEYS per side, same order
+        self.turns = turns
+        # index of the winning side; None for a draw at the MAX_TICKS cap
+        self.side = 0 if hp[1] <= 0 else 1 if hp[0] <= 0 else None
+
+    @property
+    def draw(self):
+        return self.side is None
+
+    @property
+    def winner(self):
+        return None if self.side is None else self.names[self.side]
+
+    @property
+    def loser(self):
+        return None if self.side is None else self.names[1 - self.side]
+
+
+# main logic battle (no animations)
+# returns (move_log, turns); at the "summary" / "outcome" levels the BattleOutcome
+# takes the move log's place. simulate_outcome has the arguments.
+def simulate_battle(f1_base: Fighter, f2_base: Fighter, battle_id, seed=None, recorder=None,
+                    log="full", sample_rate=0.0):
+    move_log, outcome = simulate_outcome(f1_base, f2_base, battle_id, seed, recorder,
+                                         log, sample_rate)
+    return (move_log if move_log is not None else outcome), outcome.turns
+
+
+# one battle, returning (move_log, BattleOutcome)
+# with a seed the battle draws from its own RNG stream and can be replayed exactly.
+# log: "full"                -> every move goes into `recorder` (a new MoveRecorder unless passed in)
+#      "summary" / "outcome" -> no move log (move_log is None); the outcome has the totals either way
+# sample_rate upgrades that share of battles to a full log (uses the global RNG,
+# so a seeded battle plays out the same at every level)
+def simulate_outcome(f1_base: Fighter, f2_base: Fighter, battle_id, seed=None, recorder=None,
+                     log="full", sample_rate=0.0):
+
+    if log not in LOG_LEVELS:
+        raise ValueError(f"log must be one of {LOG_LEVELS}, got {log!r}")
+    if log != "full" and sample_rate and random.random() < sample_rate:
+        log = "full"
+    full = log == "full"
+
+    rng = random.Random(seed) if seed is not None else random
+
+    # fresh fighter copies
+    a = f1_base.clone_for_battle()
+    b = f2_base.clone_for_battle()
+    a.reset_for_battle()
+    b.reset_for_battle()
+    a_stats = a.stats
+    b_stats = b.stats
+
+    # timers
+    a_next = 0.0
+    b_next = 0.0
+    a_inc  = time_inc_for_speed(a.speed)
+    b_inc  = time_inc_for_speed(b.speed)
+
+    # move log with interned fighter codes
+    if full:
+        move_log = recorder if recorder is not None else MoveRecorder()
+        a_code = move_log.code(a.name)
+        b_code = move_log.code(b.name)
+        record = move_log.record
+    else:
+        a_code, b_code = 0, 1
+
+    # counters per side, in BattleOutcome.TOTAL_KEYS order
+    totals = [[0, 0, 0, 0, 0], [0, 0, 0, 0, 0]]
+
+    turn = 0
+    tick = 0
+
+    # loop until someone dies
+    while a.health > 0 and b.health > 0 and tick < MAX_TICKS:
+        tick += 1
+
+        # pick attacker based on timers (att / dfd: their shared stat blocks)
+        if a_next <= b_next:
+            attacker, defender = a, b
+            att, dfd = a_stats, b_stats
+            att_code, def_code = a_code, b_code
+            cur_time, inc = a_next, a_inc
+        else:
+            attacker, defender = b, a
+            att, dfd = b_stats, a_stats
+            att_code, def_code = b_code, a_code
+            cur_time, inc = b_next, b_inc
+
+        turn += 1
+
+        att_st_before = attacker.current_stamina
+        def_hp_before = defender.health
+
+        atk_type, cost, mult, variance = choose_attack_type(att, rng)
+
+        # exhaustion checks
+        if attacker.current_stamina < cost:
+
+            # tired strike
+            if attacker.current_stamina >= 2:
+                atk_type = "tired_strike"
+                cost = max(1, cost // 2)
+                mult = 0.5
+                variance = (-1, 1)
+
+            # fully exhausted
+            else:
+                attacker_after_cost = att_st_before
+                attacker.current_stamina = min(att.stamina,
+                                               attacker_after_cost + att.stamina_regen)
+                defender.current_stamina = min(dfd.stamina,
+                                               defender.current_stamina + dfd.stamina_regen)
+
+                if full:
+                    record(battle_id, cur_time, turn, att_code, def_code, SKIP, 0,
+                           att_st_before, attacker_after_cost, attacker.current_stamina,
+                           def_hp_before, defender.health, False, 0, False)
+                totals[attacker is b][0] += 1
+
+                if attacker is a:
+                    a_next += a_inc
+                else:
+                    b_next += b_inc
+                continue
+
+        # apply stamina cost
+        attacker_after_cost = max(0, att_st_before - cost)
+
+        # evasion
+        dodged = rng.random() < dfd.evasion
+
+        if dodged:
+            damage = 0
+            crit = False
+            def_hp_after = defender.health
+
+        else:
+            base = max(0, att.strength - dfd.defense + rng.randint(*variance))
+            crit = rng.random() < att.critchance
+            damage = max(0, int(base * mult * (att.critmult if crit else 1.0)))
+            def_hp_after = max(0, defender.health - damage)
+            defender.health = def_hp_after
+
+        # regen stamina
+        attacker.current_stamina = min(att.stamina,
+                                       attacker_after_cost + att.stamina_regen)
+        defender.current_stamina = min(dfd.stamina,
+                                       defender.current_stamina + dfd.stamina_regen)
+
+        # log move (message is built later, only if someone reads it)
+        if full:
+            record(battle_id, cur_time, turn, att_code, def_code, ATTACK_CODES[atk_type], cost,
+                   att_st_before, attacker_after_cost, attacker.current_stamina,
+                   def_hp_before, def_hp_after, not dodged, damage, crit)
+
+        side = totals[attacker is b]
+        side[0] += 1
+        if dodged:
+            totals[defender is b][4] += 1
+        else:
+            side[1] += damage
+            side[2] += 1
+            side[3] += crit
+
+        # move attacker timer
+        if attacker is a:
+            a_next += inc
+        else:
+            b_next += inc
+
+    keys = BattleOutcome.TOTAL_KEYS
+    outcome = BattleOutcome((a.name, b.name), (a.health, b.health),
+                            (dict(zip(keys, totals[0])), dict(zip(keys, totals[1]))), turn)
+    return (move_log if full else None), outcome
+
+
+# results.csv row for one battle (None for a draw at the tick cap)
+def result_row(battle_id, outcome: BattleOutcome, seed=None):
+    if outcome.draw:
+        return None
+    w = outcome.totals[outcome.side]
+    l = outcome.totals[1 - outcome.side]
+
+    return {
+        "battle_id": battle_id,
+        "fighter1": outcome.names[0],
+        "fighter2": outcome.names[1],
+        "winner": outcome.winner,
+        "loser": outcome.loser,
+        "winner_hp": outcome.hp[outcome.side],
+        "turns": outcome.turns,
+        "total_damage_winner": w["damage"],
+        "total_damage_loser": l["damage"],
+        # both count every move that didn't hit (dodged attacks and skipped turns),
+        # as results.csv always has
+        "total_misses": (w["moves"] - w["hits"]) + (l["moves"] - l["hits"]),
+        "total_dodges": (w["moves"] - w["hits"]) + (l["moves"] - l["hits"]),
+        "crits_winner": w["crits"],
+        "crits_loser": l["crits"],
+        # per-side move / hit counts, so the aggregates can count battles whose
+        # moves are kept only by seed
+        "moves_winner": w["moves"],
+        "moves_loser": l["moves"],
+        "hits_winner": w["hits"],
+        "hits_loser": l["hits"],
+        "seed": seed,
+    }
+
+
+# measure import time in a fresh interpreter
+def measure_import_ms():
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, time\n"
+        "t = time.perf_counter()\n"
+        "import battle_engine\n"
+        "ms = (time.perf_counter() - t) * 1000\n"
+        "heavy = [m for m in ('pygame', 'pandas', 'matplotlib', 'numpy') if m in sys.modules]\n"
+        "print(ms, ','.join(heavy))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=SCRIPT_DIR,
+                         capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), (out[1].split(",") if len(out) > 1 else [])
+
+
+# Check the import budget
+if __name__ == "__main__":
+    ms, heavy = measure_import_ms()
+    print(f"import battle_engine: {ms:.1f} ms (budget {IMPORT_BUDGET_MS} ms)")
+    if heavy:
+        print(f"[X] Pulled in heavy modules: {', '.join(heavy)}")
+    elif ms > IMPORT_BUDGET_MS:
+        print("[X] Over budget.")
+    else:
+        print("[O] Within budget.")
@@ -0,0 +1,194 @@
+# battle_model.py
+
+import os
+import sys
+import math
+import time
+import pickle
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+
+from battle_store import load_moves, load_summaries, moves_since, last_battle_id
+from battle_stats import battle_summaries, paired_features, PAIR_FEATURES, SUMMARY_MOVE_COLUMNS
+
+try:
+    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    SCRIPT_DIR = os.getcwd()
+
+# part6's model, its feature table and the last battle_id it has seen
+MODEL_PATH = os.path.join(SCRIPT_DIR, "battle_model.pkl")
+
+FEATURES = list(PAIR_FEATURES)
+
+# a full fit grows BASE_TREES trees; each update adds trees for the new battles
+# (their share of the table, at least MIN_NEW_TREES) and drops the oldest past MAX_TREES
+BASE_TREES = 300
+MIN_NEW_TREES = 10
+MAX_TREES = 600
+
+# pair rows per predict_proba call when filling the win matrix (bounds memory)
+MATRIX_CHUNK = 250_000
+
+
+# random forest on a feature table; fitted with n_jobs workers, predicts in-process
+# (a worker pool costs more than a single-row predict_proba)
+def fit_forest(rel, n_trees=BASE_TREES, n_jobs=-1):
+    model = RandomForestClassifier(n_estimators=n_trees, random_state=60, n_jobs=n_jobs)
+    model.fit(rel[FEATURES], rel["win"])
+    model.set_params(n_jobs=None)
+    return model
+
+
+# the full training table and its watermark: every stored / seeded battle up to
+# the last battle_id recorded, plus the summaries of rolled-up battles; read from
+# battles.db, not the CSV exports, which lack seed-only and rolled-up battles
+def training_table():
+    watermark = last_battle_id()
+    moves = load_moves(columns=SUMMARY_MOVE_COLUMNS)
+    agg = battle_summaries(moves[moves["battle_id"] <= watermark])
+
+    rolled = load_summaries()
+    if len(rolled):
+        agg = pd.concat([agg, rolled], ignore_index=True)
+        agg = agg.sort_values(["battle_id", "attacker"], kind="stable").reset_index(drop=True)
+
+    # one A-vs-B and one B-vs-A row of feature differences per battle
+    rel = paired_features(agg)
+    if rel.empty:
+        raise ValueError("Not enough usable battle data to train the AI.")
+    return rel, watermark
+
+
+# trained model + the feature table it was fitted on, up to battle `watermark`
+class Predictor:
+
+    def __init__(self, model, rel, watermark, matrix=None):
+        self.model = model
+        self.rel = rel
+        self.watermark = watermark
+        self._profiles = None
+        self._matrix = matrix
+
+    @property
+    def fighters(self):
+        return list(self.profiles.index)
+
+    # fighter -> mean of its A-side feature rows, plus their count (samples);
+    # fighters sorted by name
+    @property
+    def profiles(self):
+        if self._profiles is None:
+            by_fighter = self.rel.groupby("fighterA")
+            self._profiles = by_fighter[FEATURES].mean().fillna(0).assign(
+                samples=by_fighter.size())
+        return self._profiles
+
+    # P(row fighter beats column fighter) for every pair of profiles, from batched
+    # predict_proba calls on their differences; kept (and saved) until the model
+    # changes. The diagonal is NaN.
+    def win_matrix(self):
+        if self._matrix is None:
+            values = self.profiles[FEATURES].to_numpy()
+            n = len(values)
+            step = max(1, MATRIX_CHUNK // max(n, 1))
+            probs = np.empty((n, n))
+            self.model.set_params(n_jobs=-1)
+            for start in range(0, n, step):
+                diffs = values[start:start + step, None, :] - values[None, :, :]
+                rows = pd.DataFrame(diffs.reshape(-1, len(FEATURES)), columns=FEATURES)
+                probs[start:start + step] = self.model.predict_proba(rows)[:, 1].reshape(-1, n)
+            self.model.set_params(n_jobs=None)
+            np.fill_diagonal(probs, np.nan)
+            self._matrix = pd.DataFrame(probs, index=self.profiles.index,
+                                        columns=self.profiles.index)
+        return self._matrix
+
+    # P(f1 beats f2)
+    def predict(self, f1, f2):
+        return float(self.win_matrix().at[f1, f2])
+
+    # fold in the battles recorded since the watermark: their rows join the table
+    # and a few warm-started trees are fitted on it; returns the rows added
+    # (battle IDs are reserved in blocks, so a block finished after a later one
+    # was trained on is only picked up by a full retrain)
+    def update(self, n_jobs=-1):
+        top = last_battle_id()
+        if top <= self.watermark:
+            return 0
+        moves = moves_since(self.watermark, SUMMARY_MOVE_COLUMNS)
+        new = paired_features(battle_summaries(moves[moves["battle_id"] <= top]))
+        self.watermark = top
+        if new.empty:
+            return 0
+
+        self.rel = pd.concat([self.rel, new], ignore_index=True)
+        self._profiles = self._matrix = None
+        model = self.model
+        n_new = max(MIN_NEW_TREES, math.ceil(BASE_TREES * len(new) / len(self.rel)))
+        # warm-started trees are seeded by their position in the forest, which
+        # repeats once it is trimmed to MAX_TREES; a seed per watermark keeps
+        # every update's trees different
+        model.set_params(warm_start=True, n_jobs=n_jobs, random_state=top % 2 ** 32,
+                         n_estimators=len(model.estimators_) + n_new)
+        model.fit(self.rel[FEATURES], self.rel["win"])
+        if len(model.estimators_) > MAX_TREES:
+            model.estimators_ = model.estimators_[-MAX_TREES:]
+        model.set_params(warm_start=False, n_jobs=None, n_estimators=len(model.estimators_))
+        return len(new)
+
+    # saved with its win matrix, so the next start needs no predictions
+    def save(self, path=MODEL_PATH):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as fh:
+            pickle.dump({
+                "features": FEATURES, "sklearn": sklearn.__version__,
+                "model": self.model, "rel": self.rel, "watermark": self.watermark,
+                "matrix": self.win_matrix(),
+            }, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    # None when there is no usable saved model (missing, other features, other sklearn)
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        try:
+            with open(path, "rb") as fh:
+                saved = pickle.load(fh)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        if not isinstance(saved, dict) or saved.get("features") != FEATURES \
+                or saved.get("sklearn") != sklearn.__version__:
+            return None
+        return cls(saved["model"], saved["rel"], saved["watermark"], saved.get("matrix"))
+
+
+# full fit on every battle, using all cores; replaces the saved model
+def retrain(path=MODEL_PATH, n_jobs=-1):
+    rel, watermark = training_table()
+    predictor = Predictor(fit_forest(rel, n_jobs=n_jobs), rel, watermark)
+    predictor.save(path)
+    return predictor
+
+
+# the saved model brought up to date with any new battles
+# (a full retrain when there is none yet, or when asked for)
+def load_predictor(path=MODEL_PATH, retrain_all=False):
+    predictor = None if retrain_all else Predictor.load(path)
+    if predictor is None:
+        return retrain(path)
+    if predictor.update():
+        predictor.save(path)
+    return predictor
+
+
+# python battle_model.py [retrain]
+if __name__ == "__main__":
+    full = len(sys.argv) > 1 and sys.argv[1] == "retrain"
+    start = time.perf_counter()
+    predictor = load_predictor(retrain_all=full)
+    print(f"{'Retrained' if full else 'Loaded'} model: {len(predictor.model.estimators_)} trees, "
+          f"{len(predictor.rel)} rows up to battle {predictor.watermark} "
+          f"in {time.perf_counter() - start:.2f}s")
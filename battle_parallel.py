@@ -0,0 +1,135 @@
+# battle_parallel.py
+
+import os
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from itertools import islice
+
+from battle_engine import Fighter, MoveRecorder, simulate_outcome, result_row, battle_seed
+from battle_writer import push, WAIT_SECONDS
+
+CHUNK_SIZE = 1000
+
+# writer queue and `dead` event for this worker process (set by the pool initializer)
+_queue = None
+_dead = None
+
+
+def _attach(queue, dead):
+    global _queue, _dead
+    _queue, _dead = queue, dead
+
+
+def _check_writer():
+    if _dead.is_set():
+        raise RuntimeError("Store writer exited; block not written.")
+
+
+# one work unit: a block of contiguous battle IDs
+# log / sample_rate as in simulate_outcome; keep_moves=False drops move logs entirely
+# (they can be rebuilt from the recorded seed)
+def simulate_chunk(f1: Fighter, f2: Fighter, first_id, count, keep_moves=True,
+                   log="full", sample_rate=0.0):
+    if not keep_moves:
+        log, sample_rate = "outcome", 0.0
+
+    all_moves = MoveRecorder()
+    results = []
+
+    for battle_id in range(first_id, first_id + count):
+        seed = battle_seed()
+        _, outcome = simulate_outcome(f1, f2, battle_id, seed, recorder=all_moves,
+                                      log=log, sample_rate=sample_rate)
+
+        row = result_row(battle_id, outcome, seed)
+        if row is not None:
+            results.append(row)
+
+    return all_moves, results
+
+
+# simulate a block and push it straight to the writer; only results come back
+def persist_chunk(f1: Fighter, f2: Fighter, first_id, count, keep_moves=True,
+                  log="full", sample_rate=0.0):
+    moves, results = simulate_chunk(f1, f2, first_id, count, keep_moves, log, sample_rate)
+    push(_queue, moves, results, _check_writer)
+    return None, results
+
+
+# process pool whose workers persist through a StoreWriter when one is given
+def make_pool(workers, writer=None):
+    if writer is None:
+        return ProcessPoolExecutor(max_workers=workers)
+    return ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                               initargs=(writer.queue, writer.dead))
+
+
+# a block's (moves, results); with a writer, checks every WAIT_SECONDS that it
+# is still running, so a dead writer can't leave this waiting on a stuck worker
+def wait_result(fut, writer=None):
+    if writer is None:
+        return fut.result()
+    while True:
+        try:
+            return fut.result(timeout=WAIT_SECONDS)
+        except FutureTimeout:
+            writer.check()
+
+
+# split n battles into (first_id, count) blocks
+def make_chunks(first_id, n, chunk_size=CHUNK_SIZE):
+    return [(first_id + i, min(chunk_size, n - i)) for i in range(0, n, chunk_size)]
+
+
+# run n battles on a process pool; yields (count, moves, results) per block in ID order
+# so the caller can stay the only writer -- or, given a StoreWriter, workers push
+# their blocks to the writer themselves and moves comes back as None
+# pool: a make_pool pool to run on (kept open), instead of a new one for this call
+def run_parallel(f1: Fighter, f2: Fighter, n, first_id, workers=None, chunk_size=CHUNK_SIZE,
+                 keep_moves=True, log="full", sample_rate=0.0, writer=None, pool=None):
+    chunks = make_chunks(first_id, n, chunk_size)
+    workers = workers or os.cpu_count() or 1
+    task = simulate_chunk if writer is None else persist_chunk
+
+    with (nullcontext(pool) if pool is not None else make_pool(workers, writer)) as pool:
+        # keep a few blocks per worker in flight so finished work can't pile up
+        window = 2 * workers
+        pending = deque()
+        todo = iter(chunks)
+
+        def submit(start, count):
+            fut = pool.submit(task, f1, f2, start, count, keep_moves, log, sample_rate)
+            pending.append((count, fut))
+
+        for start, count in islice(todo, window):
+            submit(start, count)
+
+        try:
+            while pending:
+                count, fut = pending.popleft()
+                moves, results = wait_result(fut, writer)
+                for start, next_count in islice(todo, 1):
+                    submit(start, next_count)
+                yield count, moves, results
+        finally:
+            for _, fut in pending:
+                fut.cancel()
+
+
+# play a list of (f1, f2, first_id) matches of `count` battles each on a pool
+# (`pool`, or a new one); workers persist through `writer`, results rows come
+# back per match, in order
+def run_matches(matches, count, writer, workers=None, keep_moves=True,
+                log="full", sample_rate=0.0, pool=None):
+    workers = workers or os.cpu_count() or 1
+    with (nullcontext(pool) if pool is not None else make_pool(workers, writer)) as pool:
+        futures = [
+            pool.submit(persist_chunk, f1, f2, first_id, count, keep_moves, log, sample_rate)
+            for f1, f2, first_id in matches
+        ]
+        try:
+            return [wait_result(fut, writer)[1] for fut in futures]
+        finally:
+            for fut in futures:
+                fut.cancel()
@@ -0,0 +1,158 @@
+# battle_parquet.py
+
+import os
+import sys
+import time
+import shutil
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+import battle_db
+from battle_engine import MOVE_COLUMNS
+from battle_compact import read_moves_csv
+
+# battles per partition directory (battle_block=<battle_id // PARTITION_SIZE>)
+PARTITION_SIZE = 100_000
+
+# moves saved since the last write before append adds them as new files (fewer,
+# larger files); readers take the newer moves from battles.db (battle_store.stored_moves)
+APPEND_ROWS = 50_000
+
+NAME = pa.dictionary(pa.int32(), pa.string())
+CODE = pa.dictionary(pa.int8(), pa.string())
+
+SCHEMA = pa.schema([
+    ("battle_id", pa.int64()), ("time", pa.float64()), ("turn", pa.int32()),
+    ("attacker", NAME), ("defender", NAME), ("attack_type", CODE),
+    ("stamina_cost", pa.int32()), ("attacker_stamina_before", pa.int32()),
+    ("attacker_stamina_after_cost", pa.int32()), ("attacker_stamina_after", pa.int32()),
+    ("defender_health_before", pa.int32()), ("defender_health_after", pa.int32()),
+    ("hit", pa.bool_()), ("damage_dealt", pa.int32()), ("critical", pa.bool_()),
+    ("message", pa.string()),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([("battle_block", pa.int64())]), flavor="hive")
+
+
+# write one table as new files under root, split by battle_id block
+# returns the paths of the files written
+def write_table(table, root):
+    if table.num_rows == 0:
+        return []
+    block = pc.divide(table["battle_id"], PARTITION_SIZE)
+    table = table.append_column("battle_block", block)
+    written = []
+    ds.write_dataset(
+        table, root, format="parquet", partitioning=PARTITIONING,
+        basename_template=f"part-{time.time_ns()}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_visitor=lambda f: written.append(f.path),
+    )
+    return written
+
+
+# filter for the moves of battles one fighter took part in
+def fighter_filter(name):
+    return (ds.field("attacker") == name) | (ds.field("defender") == name)
+
+
+# read moves back: only the listed columns, only rows matching the filter
+# (an expression such as fighter_filter("Blaze"), applied while scanning)
+# categorical=True keeps names / attack types as pandas categories
+def read_moves(root, columns=None, filter=None, categorical=False):
+    dataset = ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+    wanted = list(columns) if columns is not None else MOVE_COLUMNS
+    scan = list(dict.fromkeys(wanted + ["battle_id", "turn"]))
+
+    table = dataset.to_table(columns=scan, filter=filter)
+    table = table.sort_by([("battle_id", "ascending"), ("turn", "ascending")])
+    return to_frame(table.select(wanted), categorical)
+
+
+# Arrow table / batch -> DataFrame with the same dtypes as pd.read_csv:
+# int64 everywhere, plain strings unless categorical
+def to_frame(table, categorical=False):
+    if isinstance(table, pa.RecordBatch):
+        table = pa.Table.from_batches([table])
+
+    def read_type(t):
+        if pa.types.is_dictionary(t):
+            return t if categorical else t.value_type
+        return pa.int64() if pa.types.is_integer(t) else t
+
+    schema = pa.schema([pa.field(f.name, read_type(f.type)) for f in table.schema])
+    return table.cast(schema).to_pandas()
+
+
+# scan filter for battle_store's after= / fighter= arguments (None for neither)
+def moves_filter(after=None, fighter=None):
+    where = None if after is None else ds.field("battle_id") > after
+    if fighter is not None:
+        where = fighter_filter(fighter) if where is None else where & fighter_filter(fighter)
+    return where
+
+
+# stream the dataset in DataFrames of at most chunk_rows moves (file order)
+def iter_moves(root, columns=None, filter=None, chunk_rows=500_000):
+    dataset = ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+    for batch in dataset.to_batches(columns=columns, filter=filter, batch_size=chunk_rows):
+        if batch.num_rows:
+            yield to_frame(batch)
+
+
+def write_frames(frames, root):
+    for df in frames:
+        df = df.reindex(columns=MOVE_COLUMNS)
+        write_table(pa.Table.from_pandas(df, preserve_index=False).cast(SCHEMA), root)
+
+
+# copy an existing battle_moves.csv into a Parquet dataset
+def convert_csv(moves_path, root, chunk_rows=1_000_000):
+    write_frames(read_moves_csv(moves_path, chunk_rows=chunk_rows), root)
+
+
+# (re)write the dataset from the moves in battles.db; the old one is swapped out
+# only once the new one is complete
+def export(conn, root, chunk_rows=1_000_000):
+    tmp, old = root + ".tmp", root + ".old"
+    shutil.rmtree(tmp, ignore_errors=True)
+    top = battle_db.top_rowid(conn, "moves")
+    write_frames(battle_db.read_moves(conn, rowids=(0, top), chunk_rows=chunk_rows), tmp)
+    os.makedirs(tmp, exist_ok=True)
+    if os.path.isdir(root):
+        os.replace(root, old)
+    os.replace(tmp, root)
+    shutil.rmtree(old, ignore_errors=True)
+    battle_db.set_export_mark(conn, root, top)
+
+
+# add the moves saved since the last write as new files, once at least min_rows
+# are waiting (a full export if the dataset was never written from this database)
+def append(conn, root, min_rows=APPEND_ROWS, chunk_rows=1_000_000):
+    mark = battle_db.export_mark(conn, root)
+    if mark is None:
+        export(conn, root, chunk_rows)
+        return
+    top = battle_db.top_rowid(conn, "moves")
+    if top - mark < max(min_rows, 1):
+        return
+    write_frames(battle_db.read_moves(conn, rowids=(mark, top), chunk_rows=chunk_rows), root)
+    battle_db.set_export_mark(conn, root, top)
+
+
+# python battle_parquet.py [fighter]  -> export battles.db's moves to the dataset
+# and time a projected, filtered read
+if __name__ == "__main__":
+    from battle_store import database, PARQUET_DIR
+
+    start = time.perf_counter()
+    export(database(), PARQUET_DIR)
+    print(f"Exported to {PARQUET_DIR} in {time.perf_counter() - start:.2f}s")
+
+    name = sys.argv[1] if len(sys.argv) > 1 else None
+    start = time.perf_counter()
+    df = read_moves(PARQUET_DIR, ["battle_id", "attacker", "damage_dealt"],
+                    fighter_filter(name) if name else None)
+    print(f"Read {len(df)} moves in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,248 @@
+# battle_retention.py
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import battle_db
+from battle_db import DB_PATH, SUMMARY_COLUMNS
+from battle_engine import MoveRecorder
+from battle_compact import expand, source_columns
+from battle_store import (
+    database, regenerate_moves, warn_mismatched, fighter_index, RESULTS_PATH, MOVES_PATH, PARQUET_DIR,
+    BINLOG_PATH,
+)
+from battle_stats import battle_summaries, SUMMARY_MOVE_COLUMNS
+
+# battles summarized per pass (bounds memory while rolling up)
+BLOCK_BATTLES = 20_000
+
+
+# deterministic sample: the same battles are kept in full on every run
+def sampled(battle_ids, sample):
+    ids = np.asarray(battle_ids, dtype=np.uint64)
+    return (ids * np.uint64(2654435761)) % np.uint64(2 ** 32) < np.uint64(sample * 2 ** 32)
+
+
+# per-side move totals a results row can carry (see battle_db.seed_only_totals)
+SIDE_TOTALS = ["moves", "hits", "total_damage", "crits"]
+
+
+# results rows (rowid, battle_id, fighter1, fighter2, winner, loser, seed and the
+# per-side move totals) to roll up: battle_id below `before`, or older than the
+# newest `keep` battles of their matchup, minus the `sample` share kept in full
+def select_battles(conn, before=None, keep=None, sample=0.0):
+    sides = [f"{t}_{side}" for side in ("winner", "loser") for t in SIDE_TOTALS]
+    res = pd.read_sql_query(
+        f"SELECT rowid, battle_id, fighter1, fighter2, winner, loser, seed, {', '.join(sides)} "
+        "FROM results ORDER BY rowid", conn
+    )
+    roll = np.zeros(len(res), dtype=bool)
+    if before is not None:
+        roll |= (res["battle_id"] < before).to_numpy()
+    if keep is not None:
+        newest = res.sort_values("battle_id", ascending=False, kind="stable")
+        rank = newest.groupby(["fighter1", "fighter2"]).cumcount().sort_index()
+        roll |= (rank >= keep).to_numpy()
+    if sample:
+        roll &= ~sampled(res["battle_id"], sample)
+    return res[roll].reset_index(drop=True)
+
+
+# move rows for one block of rolled battles: stored moves, else rebuilt from the seed
+# (battles whose replay no longer matches get no summary)
+def block_moves(conn, block, fighter_by_name):
+    conn.execute("DELETE FROM rolled_ids")
+    conn.executemany("INSERT OR IGNORE INTO rolled_ids VALUES (?)",
+                     [(int(b),) for b in block["battle_id"]])
+    stored = pd.read_sql_query(
+        f"SELECT {', '.join(source_columns(SUMMARY_MOVE_COLUMNS))} FROM moves "
+        "WHERE battle_id IN (SELECT battle_id FROM rolled_ids) ORDER BY rowid", conn
+    )
+    stored = expand(stored, battle_db.FighterCodes(conn), SUMMARY_MOVE_COLUMNS)
+
+    regen = MoveRecorder()
+    mismatched = 0
+    seeded = block[block["seed"].notna() & ~block["battle_id"].isin(stored["battle_id"])]
+    for row in seeded.to_dict("records"):
+        if row["fighter1"] in fighter_by_name and row["fighter2"] in fighter_by_name:
+            mismatched += regenerate_moves(row, fighter_by_name, regen) is None
+    warn_mismatched(mismatched)
+
+    frames = [stored]
+    if len(regen):
+        frames.append(pd.DataFrame(regen.columns(with_message=False))[SUMMARY_MOVE_COLUMNS])
+    moves = pd.concat(frames, ignore_index=True)
+    return moves.sort_values(["battle_id", "turn"], kind="stable").reset_index(drop=True), stored
+
+
+# fold one block's stored moves into fighter -> [moves, hits, damage, crits]
+def add_move_totals(fighters, stored):
+    grouped = stored.groupby("attacker").agg(
+        moves=("turn", "count"), hits=("hit", "sum"),
+        damage=("damage_dealt", "sum"), crits=("critical", "sum"),
+    )
+    for name, t in grouped.iterrows():
+        f = fighters.setdefault(name, [0, 0, 0, 0])
+        for k, col in enumerate(("moves", "hits", "damage", "crits")):
+            f[k] += int(t[col])
+
+
+# fold one block's battles kept only by seed (results rows with move totals, no
+# stored moves) into the same, as add_results counted them
+def add_seed_only_totals(fighters, block, stored):
+    rows = block[block["moves_winner"].notna() & ~block["battle_id"].isin(stored["battle_id"])]
+    for side in ("winner", "loser"):
+        grouped = rows.groupby(side)[[f"{t}_{side}" for t in SIDE_TOTALS]].sum()
+        for name, t in grouped.iterrows():
+            f = fighters.setdefault(name, [0, 0, 0, 0])
+            for k, v in enumerate(t):
+                f[k] += int(v)
+
+
+# per fighter, what its rolled-up prefix grows by: (wins, losses, kept), where the
+# prefix runs through the fighter's last rolled-up fight in results order (or the
+# old prefix, if that ends later) and kept counts the stored fights left inside it;
+# a rebuild keeps the win-rate points up to there and replays only what follows
+def prefix_totals(conn, rolled):
+    res = pd.read_sql_query("SELECT rowid, winner, loser FROM results ORDER BY rowid", conn)
+    fights = pd.DataFrame({
+        "fighter": np.concatenate([res["winner"].to_numpy(object), res["loser"].to_numpy(object)]),
+        "win": np.repeat(np.array([1, 0], dtype=np.int64), len(res)),
+        "rolled": np.tile(res["rowid"].isin(rolled["rowid"]).to_numpy(), 2),
+        "pos": np.tile(np.arange(len(res)), 2),
+    }).sort_values("pos", kind="stable")
+    fights["n"] = fights.groupby("fighter").cumcount() + 1
+
+    old = dict(conn.execute("SELECT fighter, kept FROM rolled_fighter_totals"))
+    start = fights["fighter"].map(old).fillna(0).to_numpy()
+    last = fights[fights["rolled"]].groupby("fighter")["n"].max()
+    end = np.maximum(fights["fighter"].map(last).fillna(0).to_numpy(), start)
+    n = fights["n"].to_numpy()
+
+    added = fights[(n > start) & (n <= end)].groupby("fighter")["win"].agg(["sum", "size"])
+    kept = fights[(n <= end) & ~fights["rolled"].to_numpy()].groupby("fighter").size()
+    out = {}
+    for name in set(added.index) | set(kept.index):
+        wins = int(added["sum"].get(name, 0))
+        out[name] = (wins, int(added["size"].get(name, 0)) - wins, int(kept.get(name, 0)))
+    return out
+
+
+# what the rolled battles contributed to fighter_totals / matchup_totals
+# (fighters: move totals from add_move_totals / add_seed_only_totals; the prefix
+# wins / losses come from prefix_totals); every fighter's first_win / step is
+# kept, so a rebuild orders and decimates the curves as they are now
+def rolled_totals(conn, rolled, fighters):
+    prefix = prefix_totals(conn, rolled)
+    current = {name: (first_win, step) for name, first_win, step in conn.execute(
+        "SELECT fighter, first_win, step FROM fighter_totals")}
+    rows = []
+    for name in set(fighters) | set(prefix) | set(current):
+        moves = fighters.get(name, [0, 0, 0, 0])
+        wins, losses, kept = prefix.get(name, (0, 0, 0))
+        rows.append((name, wins, losses, *moves, *current.get(name, (None, 1)), kept))
+    conn.executemany(
+        "INSERT INTO rolled_fighter_totals VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (fighter) DO UPDATE SET "
+        "wins = wins + excluded.wins, losses = losses + excluded.losses, "
+        "moves = moves + excluded.moves, hits = hits + excluded.hits, "
+        "damage = damage + excluded.damage, crits = crits + excluded.crits, "
+        "first_win = excluded.first_win, step = excluded.step, kept = excluded.kept",
+        rows
+    )
+
+    pairs = rolled.assign(
+        wins1=rolled["winner"] == rolled["fighter1"],
+        wins2=rolled["winner"] == rolled["fighter2"],
+    ).groupby(["fighter1", "fighter2"]).agg(
+        battles=("battle_id", "count"), wins1=("wins1", "sum"), wins2=("wins2", "sum")
+    )
+    conn.executemany(
+        "INSERT INTO rolled_matchup_totals VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (fighter1, fighter2) DO UPDATE SET "
+        "battles = battles + excluded.battles, wins1 = wins1 + excluded.wins1, "
+        "wins2 = wins2 + excluded.wins2",
+        [(*key, int(t.battles), int(t.wins1), int(t.wins2)) for key, t in pairs.iterrows()]
+    )
+
+
+# re-export the Parquet / binary copies that exist, so they drop the rolled battles
+def rebuild_copies(conn):
+    if os.path.isdir(PARQUET_DIR):
+        import battle_parquet
+        battle_parquet.export(conn, PARQUET_DIR)
+
+    if os.path.exists(BINLOG_PATH):
+        import battle_binlog
+        battle_binlog.export(conn, BINLOG_PATH)
+
+
+# roll old battles into battle_summaries + rolled totals, drop their results rows
+# and move logs in one transaction, then rewrite the CSV files (and, for the
+# default database, any Parquet / binary copy) from the database; run it while no
+# battles are being written.
+# fighter_totals, matchup_totals and win_rate_points are left exactly as they are.
+def compact(before=None, keep=None, sample=0.0, fighters=None, db_path=DB_PATH,
+            results_path=RESULTS_PATH, moves_path=MOVES_PATH, block_battles=BLOCK_BATTLES):
+    conn = database(db_path)
+    rolled = select_battles(conn, before, keep, sample)
+    if rolled.empty:
+        return 0
+
+    fighter_by_name = fighter_index(fighters) if rolled["seed"].notna().any() else {}
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS rolled_ids (battle_id INTEGER PRIMARY KEY)")
+
+    with conn:
+        totals = {}
+        for start in range(0, len(rolled), block_battles):
+            block = rolled.iloc[start:start + block_battles]
+            moves, stored = block_moves(conn, block, fighter_by_name)
+            summaries = battle_summaries(moves)
+            conn.executemany(
+                f"INSERT INTO battle_summaries VALUES ({', '.join('?' * len(SUMMARY_COLUMNS))})",
+                [tuple(battle_db._value(v) for v in row)
+                 for row in summaries.itertuples(index=False)]
+            )
+            add_move_totals(totals, stored)
+            add_seed_only_totals(totals, block, stored)
+            conn.execute("DELETE FROM moves WHERE battle_id IN (SELECT battle_id FROM rolled_ids)")
+
+        rolled_totals(conn, rolled, totals)
+        conn.executemany("DELETE FROM results WHERE rowid = ?",
+                         [(int(r),) for r in rolled["rowid"]])
+    conn.execute("DROP TABLE rolled_ids")
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    # VACUUM renumbers rows, so every CSV export starts over
+    battle_db.reset_exports(conn)
+    battle_db.export_csv(conn, results_path, moves_path)
+    if db_path == DB_PATH:
+        rebuild_copies(conn)
+    return len(rolled)
+
+
+# python battle_retention.py [--before ID] [--keep N] [--sample RATE]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roll old battles up into summaries.")
+    parser.add_argument("--before", type=int, help="roll up battles with a lower battle_id")
+    parser.add_argument("--keep", type=int, help="keep the newest N battles per matchup")
+    parser.add_argument("--sample", type=float, default=0.0,
+                        help="share of battles kept in full regardless (0-1)")
+    args = parser.parse_args()
+    if args.before is None and args.keep is None:
+        sys.exit("Nothing to do: give --before and/or --keep.")
+
+    sizes = {p: os.path.getsize(p) for p in (DB_PATH, RESULTS_PATH, MOVES_PATH)
+             if os.path.exists(p)}
+    start = time.perf_counter()
+    n = compact(args.before, args.keep, args.sample)
+    print(f"Rolled up {n} battles in {time.perf_counter() - start:.2f}s")
+    for path, size in sizes.items():
+        print(f"  {os.path.basename(path)}: {size / 1e6:.1f} MB -> "
+              f"{os.path.getsize(path) / 1e6:.1f} MB")
@@ -0,0 +1,128 @@
+# battle_roster.py
+
+import os
+import sys
+import time
+import pickle
+import hashlib
+
+from battle_engine import Fighter, FighterStats, load_fighters, CSV_PATH
+
+# the snapshot stores one tuple of parsed stats per fighter, in this order
+# (a snapshot written with other slots is ignored and rebuilt)
+STAT_SLOTS = FighterStats.__slots__
+
+
+def snapshot_path(csv_path):
+    return csv_path + ".pkl"
+
+
+# Fighter list (csv order) with an O(1) name index; treat it as read-only
+class Roster(list):
+
+    def __init__(self, fighters=()):
+        super().__init__(fighters)
+        # first fighter wins for repeated names (same as a next(...) scan)
+        self.by_name = {}
+        for f in self:
+            self.by_name.setdefault(f.name, f)
+
+    def get(self, name, default=None):
+        return self.by_name.get(name, default)
+
+    def names(self):
+        return [f.name for f in self]
+
+
+# snapshot tuples -> Roster, skipping FighterStats' string parsing
+def _from_values(values):
+    fighters = []
+    for row in values:
+        stats = FighterStats.__new__(FighterStats)
+        for slot, value in zip(STAT_SLOTS, row):
+            setattr(stats, slot, value)
+        fighter = Fighter.__new__(Fighter)
+        fighter.stats = stats
+        fighter.reset_for_battle()
+        fighters.append(fighter)
+    return Roster(fighters)
+
+
+# parsed rosters in this process: csv path -> ((mtime_ns, size), Roster)
+_rosters = {}
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _read_snapshot(csv_path):
+    try:
+        with open(snapshot_path(csv_path), "rb") as fh:
+            snap = pickle.load(fh)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    return snap if isinstance(snap, dict) and snap.get("slots") == STAT_SLOTS else None
+
+
+# write the snapshot atomically; a read-only checkout just goes without one
+def _write_snapshot(csv_path, snap):
+    tmp = snapshot_path(csv_path) + ".tmp"
+    try:
+        with open(tmp, "wb") as fh:
+            pickle.dump(snap, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, snapshot_path(csv_path))
+    except OSError:
+        pass
+
+
+# fighters from csv_path, cheapest source first:
+# 1. this process's copy while the csv's mtime / size are unchanged
+# 2. the pickle snapshot next to the csv (same mtime / size, or same content hash)
+# 3. a fresh parse, which rewrites the snapshot
+def load_roster(csv_path=CSV_PATH):
+    stamp = _stamp(csv_path)
+    cached = _rosters.get(csv_path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    snap = _read_snapshot(csv_path)
+    if snap is not None and snap["stamp"] == stamp:
+        roster = _from_values(snap["values"])
+    else:
+        digest = file_digest(csv_path)
+        if snap is not None and snap["digest"] == digest:
+            roster = _from_values(snap["values"])
+        else:
+            roster = Roster(load_fighters(csv_path))
+        _write_snapshot(csv_path, {
+            "slots": STAT_SLOTS, "stamp": stamp, "digest": digest,
+            "values": [tuple(getattr(f.stats, s) for s in STAT_SLOTS) for f in roster],
+        })
+
+    _rosters[csv_path] = (stamp, roster)
+    return roster
+
+
+# python battle_roster.py [fighters.csv]  -> time a csv parse against the snapshot
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else CSV_PATH
+
+    start = time.perf_counter()
+    fighters = load_fighters(path)
+    print(f"Parsed {len(fighters)} fighters in {time.perf_counter() - start:.3f}s")
+
+    load_roster(path)
+    _rosters.clear()
+    start = time.perf_counter()
+    roster = load_roster(path)
+    print(f"Snapshot: {len(roster)} fighters in {time.perf_counter() - start:.3f}s")
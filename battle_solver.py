@@ -0,0 +1,175 @@
+# battle_solver.py
+
+from functools import lru_cache
+
+import numpy as np
+
+from battle_engine import Fighter, MAX_TICKS, heavy_attack_chance, time_inc_for_speed
+
+TOLERANCE = 1e-12
+
+
+# every way one attack can end, grouped by attacker stamina afterwards:
+# [(stamina after regen, damage distribution)]
+def attack_table(attacker: Fighter, defender: Fighter):
+
+    @lru_cache(maxsize=None)
+    def outcomes(att_st):
+        result = {}
+
+        def add(p, st_after, damage):
+            dist = result.setdefault(st_after, {})
+            dist[damage] = dist.get(damage, 0.0) + p
+
+        prob_heavy = heavy_attack_chance(attacker)
+        choices = [
+            (prob_heavy, attacker.stamina_heavy, 1.6, (-3, 5)),
+            (1 - prob_heavy, attacker.stamina_light, 1.0, (-1, 2)),
+        ]
+
+        for p_type, base_cost, mult, variance in choices:
+            if p_type <= 0:
+                continue
+            for roll in range(-2, 3):
+                p = p_type / 5
+                cost = max(1, base_cost + roll)
+                m, var = mult, variance
+
+                # exhaustion checks
+                if att_st < cost:
+                    if att_st >= 2:
+                        cost = max(1, cost // 2)
+                        m, var = 0.5, (-1, 1)
+                    else:
+                        add(p, min(attacker.stamina, att_st + attacker.stamina_regen), 0)
+                        continue
+
+                st_after = min(attacker.stamina, max(0, att_st - cost) + attacker.stamina_regen)
+
+                # evasion
+                if defender.evasion > 0:
+                    add(p * defender.evasion, st_after, 0)
+                p_hit = p * (1 - defender.evasion)
+                if p_hit <= 0:
+                    continue
+
+                # damage variance and crits
+                spread = var[1] - var[0] + 1
+                for v in range(var[0], var[1] + 1):
+                    base = max(0, attacker.strength - defender.defense + v)
+                    for crit, p_crit in ((True, attacker.critchance),
+                                         (False, 1 - attacker.critchance)):
+                        if p_crit <= 0:
+                            continue
+                        damage = max(0, int(base * m * (attacker.critmult if crit else 1.0)))
+                        add(p_hit / spread * p_crit, st_after, damage)
+
+        table = []
+        for st_after, dist in result.items():
+            vec = np.zeros(max(dist) + 1)
+            for damage, p in dist.items():
+                vec[damage] = p
+            table.append((st_after, vec))
+        return table
+
+    return outcomes
+
+
+# who attacks on each tick (timers never depend on the dice)
+def turn_order(f1: Fighter, f2: Fighter, max_ticks=MAX_TICKS):
+    a_inc = time_inc_for_speed(f1.speed)
+    b_inc = time_inc_for_speed(f2.speed)
+    a_next = 0.0
+    b_next = 0.0
+
+    order = []
+    for _ in range(max_ticks):
+        if a_next <= b_next:
+            order.append(0)
+            a_next += a_inc
+        else:
+            order.append(1)
+            b_next += b_inc
+    return order
+
+
+# chance that `attacker` lands the knockout on each tick, ignoring its own HP
+def knockout_ticks(attacker: Fighter, defender: Fighter, side, order, tol=TOLERANCE):
+    outcomes = attack_table(attacker, defender)
+    hp = defender.max_health
+    rest_to = np.minimum(attacker.stamina, np.arange(attacker.stamina + 1) + attacker.stamina_regen)
+
+    # grid[stamina, damage taken so far] -> probability (defender still standing)
+    grid = np.zeros((attacker.stamina + 1, hp))
+    grid[attacker.stamina, 0] = 1.0
+    ko = [0.0] * len(order)
+
+    for t, turn in enumerate(order):
+        # stop once the still-standing mass is below float noise
+        if grid.sum() < tol:
+            break
+        nxt = np.zeros_like(grid)
+
+        # attacker rests while the other side swings
+        if turn != side:
+            np.add.at(nxt, rest_to, grid)
+
+        else:
+            for st in np.flatnonzero(grid.any(axis=1)):
+                row = grid[st]
+                for st_after, dist in outcomes(int(st)):
+                    spread = np.convolve(row, dist)
+                    nxt[st_after] += spread[:hp]
+                    ko[t] += float(spread[hp:].sum())
+
+        grid = nxt
+
+    return ko
+
+
+# exact outcome distribution for one matchup
+#
+# Each fighter's stamina and the damage it deals depend only on its own dice,
+# and turn order is fixed by speed, so the two sides evolve independently.
+# The battle ends at whichever side's first knockout comes first.
+def solve_matchup(f1: Fighter, f2: Fighter, max_ticks=MAX_TICKS, tol=TOLERANCE):
+    order = turn_order(f1, f2, max_ticks)
+    ko_by_1 = knockout_ticks(f1, f2, 0, order, tol)
+    ko_by_2 = knockout_ticks(f2, f1, 1, order, tol)
+
+    p_win = 0.0
+    p_loss = 0.0
+    expected_turns = 0.0
+    alive_1 = 1.0
+    alive_2 = 1.0
+
+    for t in range(max_ticks):
+        p_win += ko_by_1[t] * alive_1
+        p_loss += ko_by_2[t] * alive_2
+        expected_turns += (ko_by_1[t] * alive_1 + ko_by_2[t] * alive_2) * (t + 1)
+        alive_2 -= ko_by_1[t]
+        alive_1 -= ko_by_2[t]
+
+    # battles still running at the tick cap end as draws
+    p_draw = max(0.0, 1.0 - p_win - p_loss)
+    expected_turns += p_draw * max_ticks
+
+    return p_win, p_loss, p_draw, expected_turns
+
+
+# Preview: exact win probabilities for every pair in the roster
+if __name__ == "__main__":
+    import time
+    from battle_engine import load_fighters
+
+    fighters = load_fighters()
+
+    for f1 in fighters:
+        for f2 in fighters:
+            if f1 is f2:
+                continue
+            start = time.perf_counter()
+            p_win, p_loss, p_draw, turns = solve_matchup(f1, f2)
+            elapsed = time.perf_counter() - start
+            print(f"{f1.name:>10} vs {f2.name:<10} {p_win:7.3%}  "
+                  f"avg turns {turns:5.2f}  ({elapsed:.2f}s)")
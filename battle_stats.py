@@ -0,0 +1,258 @@
+# battle_stats.py
+
+import math
+from collections import Counter
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+import battle_db
+from battle_db import DB_PATH, MAX_POINTS
+from battle_store import stored_moves, database, CHUNK_ROWS
+
+
+# moves recorded per fighter (part5 section 1)
+class MoveCounts:
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def add(self, moves):
+        self.counts.update(moves["attacker"].value_counts().to_dict())
+
+    # results rows with per-side move totals (battles kept only by seed)
+    def add_totals(self, results):
+        for side in ("winner", "loser"):
+            self.counts.update(results.groupby(side)[f"moves_{side}"].sum().to_dict())
+
+    def table(self):
+        counts = pd.Series(self.counts, dtype="int64").sort_index()
+        return (
+            counts
+            .rename_axis("attacker")
+            .reset_index(name="Total Moves")
+            .rename(columns={"attacker": "Fighter"})
+            .sort_values("Total Moves", ascending=False)
+        )
+
+
+# wins / losses per fighter (part5 sections 2 and 3)
+class WinLoss:
+
+    def __init__(self):
+        self.wins = Counter()
+        self.losses = Counter()
+
+    def add(self, results):
+        self.wins.update(results["winner"].value_counts().to_dict())
+        self.losses.update(results["loser"].value_counts().to_dict())
+
+    def table(self):
+        rows = []
+        for f in sorted(set(self.wins) | set(self.losses)):
+            w = self.wins.get(f, 0)
+            l = self.losses.get(f, 0)
+            total = w + l
+            winrate = w / total if total > 0 else 0
+            rows.append([f, w, l, total, winrate])
+
+        df_win = pd.DataFrame(
+            rows,
+            columns=["Fighter", "Wins", "Losses", "Total Fights", "Win Rate"]
+        )
+        df_win["Win Rate %"] = (df_win["Win Rate"] * 100).round(1)
+        return df_win.sort_values("Win Rate", ascending=False)
+
+
+# cumulative win rate after each fight, per fighter (part5 section 6)
+# keeps every step-th point; step doubles whenever a fighter passes MAX_POINTS,
+# so the curve stays exact up to MAX_POINTS fights and bounded after that
+class WinRateSeries:
+
+    def __init__(self, max_points=MAX_POINTS):
+        self.max_points = max_points
+        self.order = {}      # fighters in the order they first won
+        self.fights = Counter()
+        self.won = Counter()
+        self.points = {}     # fighter -> (fight numbers, win rates)
+        self.step = {}
+        self.last = {}
+
+    def add(self, results):
+        winner = results["winner"].to_numpy(object)
+        loser = results["loser"].to_numpy(object)
+
+        for f in pd.unique(winner):
+            self.order.setdefault(f, None)
+
+        # one row per fighter per fight, in fight order; running fight and win
+        # counts within this chunk per fighter
+        fights = pd.DataFrame({
+            "fighter": np.concatenate([winner, loser]),
+            "win": np.repeat(np.array([1, 0], dtype=np.int64), len(winner)),
+            "pos": np.tile(np.arange(len(winner)), 2),
+        }).sort_values("pos", kind="stable")
+        by_fighter = fights.groupby("fighter", sort=False)
+        fights["n"] = by_fighter.cumcount() + 1
+        fights["won"] = by_fighter["win"].cumsum()
+
+        for f, g in fights.groupby("fighter", sort=False):
+            n = self.fights[f] + g["n"].to_numpy()
+            rate = (self.won[f] + g["won"].to_numpy()) / n * 100
+            self.fights[f] = int(n[-1])
+            self.won[f] += int(g["win"].sum())
+            self.last[f] = (n[-1], rate[-1])
+
+            xs, ys = self.points.get(f, (np.zeros(0, np.int64), np.zeros(0)))
+            step = self.step.get(f, 1)
+            keep = n % step == 0
+            xs, ys = np.concatenate([xs, n[keep]]), np.concatenate([ys, rate[keep]])
+
+            while len(xs) > self.max_points:
+                step *= 2
+                keep = xs % step == 0
+                xs, ys = xs[keep], ys[keep]
+
+            self.points[f] = (xs, ys)
+            self.step[f] = step
+
+    # fighter -> (fight numbers, win rate %), always ending at the latest fight
+    def curves(self):
+        out = {}
+        for f in self.order:
+            if f not in self.points:
+                continue
+            xs, ys = self.points[f]
+            n, rate = self.last[f]
+            if not len(xs) or xs[-1] != n:
+                xs, ys = np.append(xs, n), np.append(ys, rate)
+            out[f] = (xs, ys)
+        return out
+
+
+# move columns battle_summaries reads
+SUMMARY_MOVE_COLUMNS = [
+    "battle_id", "turn", "attacker", "hit", "damage_dealt", "critical", "defender_health_after",
+]
+
+
+# per-battle, per-fighter features from move rows (part6's training input)
+# moves: SUMMARY_MOVE_COLUMNS, each battle's moves in turn order;
+# columns as battle_db.SUMMARY_COLUMNS
+def battle_summaries(moves):
+    kos = moves[moves["defender_health_after"] == 0]
+    winners = kos.groupby("battle_id")["attacker"].first().rename("winner")
+
+    agg = moves.groupby(["battle_id", "attacker"]).agg(
+        total_damage=("damage_dealt", "sum"),
+        total_hits=("hit", "sum"),
+        moves_used=("turn", "count"),
+        crits=("critical", "sum"),
+        avg_damage=("damage_dealt", "mean"),
+        opp_hp_left=("defender_health_after", "last")
+    ).reset_index()
+
+    agg = agg.merge(winners, on="battle_id", how="left")
+    agg["win"] = (agg["attacker"] == agg["winner"]).astype(int)
+    return agg[battle_db.SUMMARY_COLUMNS]
+
+
+# part6's paired features: column -> the summary column it is a difference of
+PAIR_FEATURES = {
+    "DMG": "total_damage", "CRIT": "crit_rate", "AVG": "avg_damage",
+    "MOVES": "moves_used", "OPP_HP_LEFT": "opp_hp_left",
+}
+
+
+# part6's training table from battle summaries (ordered by battle_id, attacker):
+# for each battle with two or more sides, the two with the most moves (ties keep
+# attacker order) as A / B, giving an A-vs-B row and a B-vs-A row with feature
+# differences and A's win, battles in battle_id order
+def paired_features(agg):
+    agg = agg.assign(crit_rate=agg["crits"] / agg["total_hits"].replace(0, 1))
+    ranked = agg.sort_values(["battle_id", "moves_used"], ascending=[True, False],
+                             kind="stable")
+    by_battle = ranked.groupby("battle_id", sort=False)
+    pos = by_battle.cumcount().to_numpy()
+    paired = by_battle["battle_id"].transform("size").to_numpy() >= 2
+
+    a = ranked[paired & (pos == 0)]
+    b = ranked[paired & (pos == 1)]
+
+    # a-vs-b rows at even positions, b-vs-a rows at odd ones
+    def interleave(first, second):
+        out = np.empty(2 * len(first), dtype=np.result_type(first, second))
+        out[0::2] = first
+        out[1::2] = second
+        return out
+
+    rel = {
+        "fighterA": interleave(a["attacker"].to_numpy(object), b["attacker"].to_numpy(object)),
+        "fighterB": interleave(b["attacker"].to_numpy(object), a["attacker"].to_numpy(object)),
+    }
+    for feature, col in PAIR_FEATURES.items():
+        va, vb = a[col].to_numpy(), b[col].to_numpy()
+        rel[feature] = interleave(va - vb, vb - va)
+    rel["win"] = interleave(a["win"].to_numpy(), b["win"].to_numpy())
+    return pd.DataFrame(rel)
+
+
+# Wilson score interval (low, high) for a win rate of wins / n
+# at a two-sided confidence level
+def wilson_interval(wins, n, confidence=0.95):
+    if n == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = wins / n
+    denom = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denom
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+# battles needed for a ±half_width interval around a win rate near p
+def battles_needed(p, half_width, confidence=0.95):
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return math.ceil(z * z * p * (1 - p) / (half_width * half_width))
+
+
+# one chunked pass over the moves and results in the database; memory is about
+# one chunk plus the tables (battles rolled up by battle_retention.py are gone
+# from the logs, so only from_aggregates still counts them)
+# battles kept only by seed count the move totals on their results row
+# returns (MoveCounts, WinLoss, win-rate curves)
+def summarize(db_path=DB_PATH, chunk_rows=CHUNK_ROWS, max_points=MAX_POINTS):
+    conn = database(db_path)
+    moves = MoveCounts()
+    for chunk in stored_moves(["attacker"], chunk_rows=chunk_rows, db_path=db_path):
+        moves.add(chunk)
+    for chunk in battle_db.seed_only_moves(conn, chunk_rows):
+        moves.add_totals(chunk)
+
+    win_loss = WinLoss()
+    series = WinRateSeries(max_points)
+    for chunk in pd.read_sql_query("SELECT winner, loser FROM results ORDER BY rowid", conn,
+                                   chunksize=chunk_rows):
+        win_loss.add(chunk)
+        series.add(chunk)
+
+    return moves, win_loss, series.curves()
+
+
+# the same three, read from the aggregate tables in the database (a few rows per
+# fighter, no log scan)
+def from_aggregates(db_path=DB_PATH):
+    conn = database(db_path)
+    totals = battle_db.fighter_table(conn)
+
+    moves = MoveCounts()
+    win_loss = WinLoss()
+    for row in totals.itertuples():
+        if row.moves:
+            moves.counts[row.fighter] = row.moves
+        if row.wins or row.losses:
+            win_loss.wins[row.fighter] = row.wins
+            win_loss.losses[row.fighter] = row.losses
+
+    return moves, win_loss, battle_db.win_rate_curves(conn)
@@ -0,0 +1,303 @@
+# battle_store.py
+
+import os
+import warnings
+
+import pandas as pd
+
+from battle_engine import simulate_outcome, result_row, MoveRecorder, MOVE_COLUMNS
+from battle_roster import Roster, load_roster
+import battle_db
+from battle_db import DB_PATH
+
+try:
+    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    SCRIPT_DIR = os.getcwd()
+
+# battles.db holds every results row and move; these CSV files are exports of it
+# for the notebooks, appended to on every save into the default database
+RESULTS_PATH = os.path.join(SCRIPT_DIR, "results.csv")
+MOVES_PATH   = os.path.join(SCRIPT_DIR, "battle_moves.csv")
+
+# rows per chunk when streaming the logs
+CHUNK_ROWS   = 500_000
+
+# results columns fill_move_totals replays from the seed
+MOVE_TOTAL_COLUMNS = ["moves_winner", "moves_loser", "hits_winner", "hits_loser"]
+
+# columnar copy of the move log, kept up to date once it exists (python
+# battle_parquet.py creates it; needs pyarrow); readers scan it when present
+PARQUET_DIR  = os.path.join(SCRIPT_DIR, "battle_moves_parquet")
+
+# fixed-width binary copy with a battle_id index, kept up to date once it exists
+# (python battle_binlog.py creates it); load_battle reads a battle from it
+BINLOG_PATH  = os.path.join(SCRIPT_DIR, "battle_moves.bin")
+
+
+# DataFrame from a MoveRecorder or a list of move dicts
+def moves_frame(move_log, with_message=True):
+    if isinstance(move_log, MoveRecorder):
+        return pd.DataFrame(move_log.columns(with_message))
+    return pd.DataFrame(move_log)
+
+
+# one open connection per database; a new default database first takes in any
+# existing CSV files so nothing recorded earlier is lost
+_databases = {}
+
+
+def database(db_path=DB_PATH):
+    conn = _databases.get(db_path)
+    if conn is None:
+        conn = _databases[db_path] = battle_db.connect(db_path)
+        if db_path == DB_PATH and battle_db.is_empty(conn):
+            battle_db.import_csv(conn, RESULTS_PATH, MOVES_PATH)
+        if battle_db.aggregates_stale(conn):
+            fill_move_totals(conn)
+            battle_db.rebuild_aggregates(conn)
+    return conn
+
+
+# give seeded results rows from before move totals were recorded (no stored moves,
+# no moves_winner) their totals, replaying each battle from its seed without a
+# move log, so the aggregates count them; call rebuild_aggregates afterwards
+# (battles whose replay no longer matches their row are left without totals)
+def fill_move_totals(conn, fighters=None, chunk_rows=CHUNK_ROWS):
+    fighter_by_name = None
+    updates = []
+    mismatched = 0
+    for rows in battle_db.unstored_results(conn, chunk_rows=chunk_rows):
+        if fighter_by_name is None:
+            fighter_by_name = fighter_index(fighters)
+        for row in rows:
+            if row["moves_winner"] is not None or not (
+                row["fighter1"] in fighter_by_name and row["fighter2"] in fighter_by_name
+            ):
+                continue
+            _, outcome = simulate_outcome(
+                fighter_by_name[row["fighter1"]], fighter_by_name[row["fighter2"]],
+                int(row["battle_id"]), seed=int(row["seed"]), log="outcome"
+            )
+            if not replay_matches(row, outcome):
+                mismatched += 1
+                continue
+            replayed = result_row(row["battle_id"], outcome, row["seed"])
+            updates.append((*(replayed[c] for c in MOVE_TOTAL_COLUMNS),
+                            row["battle_id"], row["seed"]))
+
+    warn_mismatched(mismatched)
+    with conn:
+        conn.executemany(
+            f"UPDATE results SET {', '.join(c + ' = ?' for c in MOVE_TOTAL_COLUMNS)} "
+            "WHERE battle_id = ? AND seed = ?", updates
+        )
+
+
+# summaries of battles rolled up by battle_retention.py (empty if none)
+def load_summaries(db_path=DB_PATH):
+    return battle_db.summaries_frame(database(db_path))
+
+
+# reserve a block of battle IDs (first ID returned)
+def reserve_battle_ids(count=1, db_path=DB_PATH):
+    return battle_db.reserve_ids(database(db_path), count)
+
+
+# durable checkpoint: fold the WAL into the database
+def checkpoint():
+    for conn in _databases.values():
+        conn.execute("PRAGMA wal_checkpoint(FULL)")
+
+
+# Save battle moves to the database, then append them to battle_moves.csv
+def save_moves(move_log, db_path=DB_PATH):
+    if not len(move_log):
+        return
+    conn = database(db_path)
+    battle_db.insert_moves(conn, move_log)
+    if db_path == DB_PATH:
+        battle_db.append_moves(conn, MOVES_PATH)
+        append_copies(conn)
+
+
+# add new moves to the copies of the move log that exist
+def append_copies(conn):
+    if os.path.isdir(PARQUET_DIR):
+        import battle_parquet
+        battle_parquet.append(conn, PARQUET_DIR)
+    if os.path.exists(BINLOG_PATH):
+        import battle_binlog
+        battle_binlog.append(conn, BINLOG_PATH)
+
+
+# save results to the database (one stats dict or a list of them), then append
+# them to results.csv
+def save_results(stats, db_path=DB_PATH):
+    rows = [stats] if isinstance(stats, dict) else list(stats)
+    if not rows:
+        return
+    conn = database(db_path)
+    battle_db.insert_results(conn, rows)
+    if db_path == DB_PATH:
+        battle_db.append_results(conn, RESULTS_PATH)
+
+
+# bring the CSV files up to date by hand, e.g. to export another database
+# (appends only the rows saved since the last sync)
+def sync_csv(results_path=RESULTS_PATH, moves_path=MOVES_PATH, db_path=DB_PATH):
+    battle_db.append_csv(database(db_path), results_path, moves_path)
+
+
+# name -> Fighter for the given fighters (default: the cached roster)
+def fighter_index(fighters=None):
+    if not fighters:
+        return load_roster().by_name
+    if isinstance(fighters, Roster):
+        return fighters.by_name
+    return {f.name: f for f in fighters}
+
+
+# a seed replays its battle only while both fighters keep the stats they had;
+# the replay counts as the recorded battle when it has the row's winner, turns
+# and winner_hp (columns the row lacks are not compared)
+def replay_matches(row, outcome):
+    if outcome.draw:
+        return False
+    replayed = {"winner": outcome.winner, "turns": outcome.turns,
+                "winner_hp": outcome.hp[outcome.side]}
+    return all(row.get(c) is None or pd.isna(row[c]) or row[c] == v
+               for c, v in replayed.items())
+
+
+# seeded battles left out because their replay no longer matches
+def warn_mismatched(count):
+    if count:
+        warnings.warn(f"{count} seeded battles no longer replay as recorded (fighter "
+                      "stats changed since) and were left out", stacklevel=3)
+
+
+# rebuild one seeded battle's move log from its results row (appended to recorder
+# if given); None, with nothing appended, if the replay doesn't match the row
+def regenerate_moves(row, fighter_by_name, recorder=None):
+    f1 = fighter_by_name[row["fighter1"]]
+    f2 = fighter_by_name[row["fighter2"]]
+    start = None if recorder is None else len(recorder.buffer)
+    moves, outcome = simulate_outcome(f1, f2, int(row["battle_id"]), seed=int(row["seed"]),
+                                      recorder=recorder)
+    if not replay_matches(row, outcome):
+        if recorder is not None:
+            del recorder.buffer[start:]
+        return None
+    return moves
+
+
+# one recorded battle, ready to replay: (fighter1, fighter2, move_log)
+# read straight from the binary log when it has the battle, else rebuilt from the seed
+def load_battle(battle_id, fighters=None, db_path=DB_PATH):
+    fighter_by_name = fighter_index(fighters)
+
+    if os.path.exists(BINLOG_PATH):
+        from battle_binlog import open_log
+        moves = open_log(BINLOG_PATH).recorder(battle_id)
+        if moves is not None:
+            # fighter1 always moves first
+            first = moves[0]
+            return fighter_by_name[first["attacker"]], fighter_by_name[first["defender"]], moves
+
+    row = battle_db.find_result(database(db_path), battle_id)
+    if row is None:
+        raise ValueError(f"No seeded result for battle {battle_id}.")
+
+    moves = regenerate_moves(row, fighter_by_name)
+    if moves is None:
+        raise ValueError(f"Battle {battle_id} no longer replays from its seed "
+                         "(fighter stats changed since it was recorded).")
+    return fighter_by_name[row["fighter1"]], fighter_by_name[row["fighter2"]], moves
+
+
+# highest battle_id recorded so far (0 if none)
+def last_battle_id(db_path=DB_PATH):
+    return battle_db.last_battle_id(database(db_path))
+
+
+# stored moves only, as battle_db.read_moves: what the Parquet copy holds is
+# scanned from it (columns and filters pushed into the scan), the moves saved
+# since it was last written come from battles.db
+def stored_moves(columns=None, after=None, fighter=None, chunk_rows=CHUNK_ROWS,
+                 db_path=DB_PATH):
+    conn = database(db_path)
+    mark = None
+    if db_path == DB_PATH and os.path.isdir(PARQUET_DIR):
+        mark = battle_db.export_mark(conn, PARQUET_DIR)
+    if mark is None:
+        yield from battle_db.read_moves(conn, columns, after, fighter, chunk_rows=chunk_rows)
+        return
+
+    import battle_parquet
+    wanted = MOVE_COLUMNS if columns is None else list(columns)
+    yield from battle_parquet.iter_moves(PARQUET_DIR, wanted,
+                                         battle_parquet.moves_filter(after, fighter), chunk_rows)
+    yield from battle_db.read_moves(conn, columns, after, fighter,
+                                    (mark, battle_db.top_rowid(conn, "moves")), chunk_rows)
+
+
+# stored moves, then moves rebuilt from seeds for seeded battles that were never
+# stored (those whose replay no longer matches are left out), in chunks of about
+# chunk_rows (memory stays at one chunk)
+# columns: only these; fighter: only battles that fighter took part in;
+# after: only battles with a higher battle_id
+def iter_moves(fighters=None, columns=None, chunk_rows=CHUNK_ROWS, fighter=None, after=None,
+               db_path=DB_PATH):
+    conn = database(db_path)
+    yield from stored_moves(columns, after, fighter, chunk_rows, db_path)
+
+    with_message = columns is None or "message" in columns
+    fighter_by_name = None
+    regen = MoveRecorder()
+    mismatched = 0
+
+    for rows in battle_db.unstored_results(conn, after, fighter, chunk_rows):
+        if fighter_by_name is None:
+            fighter_by_name = fighter_index(fighters)
+        for row in rows:
+            if row["fighter1"] in fighter_by_name and row["fighter2"] in fighter_by_name:
+                mismatched += regenerate_moves(row, fighter_by_name, regen) is None
+            if len(regen) >= chunk_rows:
+                df = moves_frame(regen, with_message)
+                yield df if columns is None else df[list(columns)]
+                regen = MoveRecorder()
+
+    if len(regen):
+        df = moves_frame(regen, with_message)
+        yield df if columns is None else df[list(columns)]
+    warn_mismatched(mismatched)
+
+
+# iter_moves as one frame sorted by battle_id and turn (None if there are no moves)
+def _moves_table(fighters, columns, fighter, after, db_path):
+    keep = None if columns is None else list(dict.fromkeys(["battle_id", "turn", *columns]))
+    frames = list(iter_moves(fighters, keep, CHUNK_ROWS, fighter, after, db_path))
+    if not frames:
+        return None
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    df = df.sort_values(["battle_id", "turn"], kind="stable").reset_index(drop=True)
+    return df if columns is None else df[list(columns)]
+
+
+# every recorded move: stored moves plus moves rebuilt from seeds
+# columns: only load these; fighter: only battles that fighter took part in
+def load_moves(fighters=None, columns=None, fighter=None, db_path=DB_PATH):
+    df = _moves_table(fighters, columns, fighter, None, db_path)
+    if df is None:
+        raise FileNotFoundError("No battles recorded yet — run battles first.")
+    return df
+
+
+# load_moves for only the battles after battle_id (indexed, so the cost follows
+# the number of new battles, not the log size)
+def moves_since(battle_id, columns=None, fighters=None, db_path=DB_PATH):
+    df = _moves_table(fighters, columns, None, battle_id, db_path)
+    if df is None:
+        return pd.DataFrame(columns=MOVE_COLUMNS if columns is None else list(columns))
+    return df
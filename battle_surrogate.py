@@ -0,0 +1,212 @@
+# battle_surrogate.py
+#
+# Pre-fight win probability straight from two stat lines, learned from batches of
+# simulated battles (battle_batch.py) between random fighters. Meant for balance
+# work: thousands of what-if matchups per call, no simulation at predict time.
+
+import os
+import sys
+import time
+import pickle
+
+import numpy as np
+import sklearn
+from sklearn.ensemble import HistGradientBoostingRegressor
+
+from battle_engine import Fighter, CLASS_MODIFIERS, load_fighters
+from battle_batch import stat_arrays, simulate_arrays, simulate_matchups, FIGHTER1, DRAW
+
+try:
+    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    SCRIPT_DIR = os.getcwd()
+
+SURROGATE_PATH = os.path.join(SCRIPT_DIR, "battle_surrogate.pkl")
+
+# csv stat -> range the training fighters are drawn from (a bit wider than the
+# roster, so edited fighters stay inside it); ints for integer stats
+STAT_RANGES = {
+    "health": (70, 170), "strength": (12, 40), "defense": (2, 24), "speed": (5, 32),
+    "stamina": (60, 170), "critchance": (0.0, 0.35), "critmult": (1.2, 2.6),
+    "evasion": (0.0, 0.25), "stamina_regen": (1, 5), "stamina_light": (5, 11),
+    "stamina_heavy": (10, 20),
+}
+
+# default training set: random matchups x battles per matchup
+TRAIN_PAIRS = 3000
+TRAIN_BATTLES = 200
+
+# per-side stat_arrays entries the model sees (the class enters through
+# prob_heavy, the only place the engine reads it)
+SIDE_STATS = [
+    "max_health", "strength", "defense", "stamina", "critchance", "critmult", "evasion",
+    "stamina_regen", "stamina_light", "stamina_heavy", "prob_heavy", "inc",
+]
+
+FEATURES = (
+    [f"a_{s}" for s in SIDE_STATS] + [f"b_{s}" for s in SIDE_STATS]
+    + ["hit_ab", "hit_ba", "ttk_ab", "ttk_ba", "ttk_ratio", "endurance_a", "endurance_b"]
+)
+
+
+# csv-style rows for n random fighters (class from CLASS_MODIFIERS)
+def random_rows(n, rng=None):
+    rng = np.random.default_rng(rng)
+    classes = list(CLASS_MODIFIERS)
+    cols = {}
+    for stat, (lo, hi) in STAT_RANGES.items():
+        if isinstance(lo, int):
+            cols[stat] = rng.integers(lo, hi + 1, size=n)
+        else:
+            cols[stat] = rng.uniform(lo, hi, size=n)
+    cls = rng.choice(classes, size=n)
+    return [{"name": f"random{i}", "class": str(cls[i]),
+             **{stat: values[i].item() for stat, values in cols.items()}} for i in range(n)]
+
+
+# expected damage of one attack: light / heavy mix over their variance rolls,
+# crits and evasion folded in
+def _expected_hit(att, dfd):
+    gap = att["strength"] - dfd["defense"]
+    light = np.mean([np.maximum(0, gap + v) for v in range(-1, 3)], axis=0)
+    heavy = 1.6 * np.mean([np.maximum(0, gap + v) for v in range(-3, 6)], axis=0)
+    base = att["prob_heavy"] * heavy + (1 - att["prob_heavy"]) * light
+    crit = 1 + att["critchance"] * (att["critmult"] - 1)
+    return base * crit * (1 - dfd["evasion"])
+
+
+# attacks before a side runs short of stamina (large when regen keeps up)
+def _endurance(side):
+    heavy = side["prob_heavy"]
+    cost = heavy * side["stamina_heavy"] + (1 - heavy) * side["stamina_light"]
+    return side["stamina"] / np.maximum(cost - side["stamina_regen"], 0.5)
+
+
+# model input rows for side_a vs side_b (stat_arrays dicts of equal length)
+def pair_features(a, b):
+    hit_ab, hit_ba = _expected_hit(a, b), _expected_hit(b, a)
+    # time to knock the other side out at the expected rate
+    ttk_ab = b["max_health"] / np.maximum(hit_ab, 0.1) * a["inc"]
+    ttk_ba = a["max_health"] / np.maximum(hit_ba, 0.1) * b["inc"]
+    cols = [a[s] for s in SIDE_STATS] + [b[s] for s in SIDE_STATS] + [
+        hit_ab, hit_ba, ttk_ab, ttk_ba, np.log(ttk_ba / ttk_ab), _endurance(a), _endurance(b),
+    ]
+    return np.column_stack(cols).astype(np.float64)
+
+
+# side -> stat_arrays dict: Fighters, csv-style rows or a stat_arrays dict
+def _side(side):
+    if isinstance(side, dict):
+        return {k: np.atleast_1d(np.asarray(side[k])) for k in SIDE_STATS}
+    if isinstance(side, Fighter):
+        side = [side]
+    return stat_arrays([f if isinstance(f, Fighter) else Fighter(f) for f in side])
+
+
+# fighter1's simulated win rate per matchup (draws count half), `battles` each
+def simulated_rates(side_a, side_b, battles, rng=None):
+    a = {k: np.repeat(v, battles) for k, v in side_a.items()}
+    b = {k: np.repeat(v, battles) for k, v in side_b.items()}
+    winners, _ = simulate_arrays(a, b, rng)
+    winners = winners.reshape(-1, battles)
+    return (winners == FIGHTER1).mean(axis=1) + 0.5 * (winners == DRAW).mean(axis=1)
+
+
+# (X, y) from `pairs` random matchups; every matchup also appears swapped
+def training_set(pairs=TRAIN_PAIRS, battles=TRAIN_BATTLES, rng=None):
+    rng = np.random.default_rng(rng)
+    a = stat_arrays([Fighter(r) for r in random_rows(pairs, rng)])
+    b = stat_arrays([Fighter(r) for r in random_rows(pairs, rng)])
+    rates = simulated_rates(a, b, battles, rng)
+    X = np.vstack([pair_features(a, b), pair_features(b, a)])
+    y = np.concatenate([rates, 1 - rates])
+    return X, y
+
+
+class Surrogate:
+
+    def __init__(self, model):
+        self.model = model
+
+    # P(side_a beats side_b) for every row; each side is a Fighter list, csv-style
+    # rows or a stat_arrays dict, and a single fighter is matched against all rows
+    # of the other side. Averaged over both seatings, so predict(a, b) = 1 - predict(b, a).
+    def predict(self, side_a, side_b):
+        a, b = _side(side_a), _side(side_b)
+        n = max(len(a["inc"]), len(b["inc"]))
+        a = {k: np.broadcast_to(v, n) for k, v in a.items()}
+        b = {k: np.broadcast_to(v, n) for k, v in b.items()}
+        p = self.model.predict(pair_features(a, b))
+        q = self.model.predict(pair_features(b, a))
+        return np.clip(0.5 * (p + 1 - q), 0.0, 1.0)
+
+    def predict_pair(self, f1, f2):
+        return float(self.predict([f1], [f2])[0])
+
+    def save(self, path=SURROGATE_PATH):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as fh:
+            pickle.dump({"features": FEATURES, "sklearn": sklearn.__version__,
+                         "model": self.model}, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    # None when there is no usable saved model (missing, other features, other sklearn)
+    @classmethod
+    def load(cls, path=SURROGATE_PATH):
+        try:
+            with open(path, "rb") as fh:
+                saved = pickle.load(fh)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        if not isinstance(saved, dict) or saved.get("features") != FEATURES \
+                or saved.get("sklearn") != sklearn.__version__:
+            return None
+        return cls(saved["model"])
+
+
+# simulate a fresh training set, fit and save
+def train(pairs=TRAIN_PAIRS, battles=TRAIN_BATTLES, rng=None, path=SURROGATE_PATH):
+    X, y = training_set(pairs, battles, rng)
+    model = HistGradientBoostingRegressor(max_iter=400, learning_rate=0.08, random_state=0)
+    model.fit(X, y)
+    surrogate = Surrogate(model)
+    surrogate.save(path)
+    return surrogate
+
+
+# the saved surrogate, trained first if there is none
+def load_surrogate(path=SURROGATE_PATH):
+    return Surrogate.load(path) or train(path=path)
+
+
+# python battle_surrogate.py [pairs] [battles]
+# -> train, then check against fresh simulations and time a batch predict
+if __name__ == "__main__":
+    pairs = int(sys.argv[1]) if len(sys.argv) > 1 else TRAIN_PAIRS
+    battles = int(sys.argv[2]) if len(sys.argv) > 2 else TRAIN_BATTLES
+
+    start = time.perf_counter()
+    surrogate = train(pairs, battles)
+    print(f"Trained on {pairs} matchups x {battles} battles in {time.perf_counter() - start:.1f}s")
+
+    rng = np.random.default_rng()
+    a = stat_arrays([Fighter(r) for r in random_rows(500, rng)])
+    b = stat_arrays([Fighter(r) for r in random_rows(500, rng)])
+    rates = simulated_rates(a, b, 1000, rng)
+    error = np.abs(surrogate.predict(a, b) - rates)
+    print(f"Fresh matchups (1000 battles each): mean error {error.mean():.1%}, "
+          f"90th percentile {np.quantile(error, 0.9):.1%}")
+
+    big_a = stat_arrays([Fighter(r) for r in random_rows(20_000, rng)])
+    big_b = stat_arrays([Fighter(r) for r in random_rows(20_000, rng)])
+    start = time.perf_counter()
+    surrogate.predict(big_a, big_b)
+    print(f"Batch predict: {20_000 / (time.perf_counter() - start):,.0f} matchups/s\n")
+
+    fighters = load_fighters()
+    pairs = [(f1, f2) for f1 in fighters for f2 in fighters if f1 is not f2]
+    winners, _ = simulate_matchups(pairs, 2000)
+    predicted = surrogate.predict([f1 for f1, _ in pairs], [f2 for _, f2 in pairs])
+    for (f1, f2), w, p in zip(pairs, winners, predicted):
+        print(f"{f1.name:>10} vs {f2.name:<10} simulated {np.mean(w == FIGHTER1):6.1%}  "
+              f"predicted {p:6.1%}")
@@ -0,0 +1,162 @@
+# battle_writer.py
+
+import atexit
+import threading
+import multiprocessing as mp
+from queue import Empty, Full
+
+from battle_engine import MoveRecorder
+
+# batches allowed in the queue before producers block
+QUEUE_SIZE = 16
+# rows written between fsync checkpoints
+CHECKPOINT_ROWS = 250_000
+# seconds between checks that the writer is still running, while waiting on it
+WAIT_SECONDS = 1.0
+
+# spawn: the writer starts with no inherited connections or buffered rows
+CONTEXT = mp.get_context("spawn")
+
+
+# producer side: hand one simulated block to the writer; while the queue is full,
+# check() runs every WAIT_SECONDS and raises if the writer is gone
+def push(queue, moves, results, check):
+    if moves is not None and len(moves):
+        _put(queue, ("moves", moves), check)
+    if results:
+        _put(queue, ("results", results), check)
+
+
+def _put(queue, item, check):
+    while True:
+        try:
+            queue.put(item, timeout=WAIT_SECONDS)
+            return
+        except Full:
+            check()
+
+
+# write one drained batch: all moves in one save, all results in another
+def write_batch(batch):
+    from battle_store import save_moves, save_results
+
+    moves = MoveRecorder()
+    results = []
+    for kind, payload in batch:
+        if kind == "results":
+            results.extend(payload)
+        elif isinstance(payload, MoveRecorder):
+            moves.extend(payload)
+        else:
+            save_moves(payload)
+
+    save_moves(moves)
+    save_results(results)
+    return len(moves) + len(results)
+
+
+# the single writer: drains the queue, batches writes, fsyncs at checkpoints;
+# sets `dead` if it fails, so producers stop waiting on the queue
+def writer_loop(queue, acks, dead, checkpoint_rows=CHECKPOINT_ROWS):
+    try:
+        _drain(queue, acks, checkpoint_rows)
+    except BaseException:
+        dead.set()
+        raise
+
+
+def _drain(queue, acks, checkpoint_rows):
+    from battle_store import checkpoint
+
+    unsynced = 0
+    while True:
+        batch = [queue.get()]
+
+        # take whatever else is already waiting so it goes out in one transaction
+        while batch[-1][0] in ("moves", "results") and len(batch) < QUEUE_SIZE:
+            try:
+                batch.append(queue.get_nowait())
+            except Empty:
+                break
+
+        control = batch[-1][0]
+        unsynced += write_batch([b for b in batch if b[0] in ("moves", "results")])
+
+        if control in ("flush", "stop") or unsynced >= checkpoint_rows:
+            checkpoint()
+            unsynced = 0
+        if control in ("flush", "stop"):
+            acks.put(control)
+        if control == "stop":
+            return
+
+
+# Owns the writer process; simulation code only ever puts batches on .queue
+# .dead is set once the writer is gone (by the writer itself, or by check())
+class StoreWriter:
+
+    def __init__(self, maxsize=QUEUE_SIZE, checkpoint_rows=CHECKPOINT_ROWS):
+        self.queue = CONTEXT.Queue(maxsize)
+        self.dead = CONTEXT.Event()
+        self._acks = CONTEXT.Queue()
+        self._proc = CONTEXT.Process(
+            target=writer_loop, args=(self.queue, self._acks, self.dead, checkpoint_rows)
+        )
+        self._proc.start()
+        self._closed = False
+        self._drain = None
+        atexit.register(self.close)
+
+    def push(self, moves, results):
+        push(self.queue, moves, results, self.check)
+
+    # raise if the writer process has exited (and tell the producers); from then
+    # on the queue is drained here, so workers stuck flushing into it can exit
+    def check(self):
+        if self.dead.is_set() or not self._proc.is_alive():
+            self.dead.set()
+            if self._drain is None:
+                self._drain = threading.Thread(target=self._discard, daemon=True)
+                self._drain.start()
+            raise RuntimeError(f"Store writer exited (code {self._proc.exitcode}).")
+
+    def _discard(self):
+        while not self._closed:
+            try:
+                self.queue.get(timeout=WAIT_SECONDS)
+            except Empty:
+                pass
+
+    # wait until everything queued so far is on disk
+    def flush(self):
+        self._request("flush")
+
+    # write everything still queued, fsync, and stop the writer
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._request("stop")
+        self._proc.join()
+
+    def _request(self, control):
+        _put(self.queue, (control, None), self.check)
+        while True:
+            try:
+                self._acks.get(timeout=WAIT_SECONDS)
+                return
+            except Empty:
+                self.check()
+
+    def __enter__(self):
+        return self
+
+    # on an error, stop the writer without raising over it if the writer is gone too
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+            return
+        try:
+            self.close()
+        except RuntimeError:
+            pass
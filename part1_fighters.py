@@ -2,6 +2,9 @@
 import os
 import pandas as pd
 
+# Class Modifiers live in the headless engine (battle_engine.py)
+from battle_engine import CLASS_MODIFIERS
+
 # Setup the File Paths
 try:
     SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -12,23 +15,6 @@ CSV_PATH = os.path.join(SCRIPT_DIR, "fighters.csv")
 SPRITE_DIR = os.path.join(SCRIPT_DIR, "sprites")
 os.makedirs(SPRITE_DIR, exist_ok=True)
 
-# Class Modifiers
-
-CLASS_MODIFIERS = {
-    "Tank":      {"health": +10, "strength": 0,  "defense": +3, "speed": -2, "stamina": +10,
-                  "evasion": 0.04, "stamina_regen": 2, "stamina_light": 8,  "stamina_heavy": 16},
-    "Warrior":   {"health": +5,  "strength": +2, "defense": +1, "speed": 0,  "stamina": +5,
-                  "evasion": 0.06, "stamina_regen": 2, "stamina_light": 8,  "stamina_heavy": 16},
-    "Mage":      {"health": -5,  "strength": +3, "defense": -2, "speed": +2, "stamina": -5,
-                  "evasion": 0.12, "stamina_regen": 3, "stamina_light": 6,  "stamina_heavy": 12},
-    "Rogue":     {"health": 0,   "strength": +1, "defense": 0,  "speed": +5, "stamina": 0,
-                  "evasion": 0.18, "stamina_regen": 4, "stamina_light": 6,  "stamina_heavy": 12},
-    "Archer":    {"health": 0,   "strength": +2, "defense": 0,  "speed": +3, "stamina": 0,
-                  "evasion": 0.14, "stamina_regen": 3, "stamina_light": 7,  "stamina_heavy": 14},
-    "Berserker": {"health": +10, "strength": +4, "defense": -1, "speed": -1, "stamina": +5,
-                  "evasion": 0.05, "stamina_regen": 2, "stamina_light": 10, "stamina_heavy": 18},
-}
-
 
 def apply_class_modifiers(fighter):    
     class_name = fighter.get("class", "")
@@ -127,6 +113,7 @@ def preview():
     from IPython.display import display, clear_output
 
     names = [f["name"] for f in fighters]
+    by_name = {f["name"]: f for f in reversed(fighters)}
 
     f1 = widgets.Dropdown(options=names, description="Fighter 1:")
     f2 = widgets.Dropdown(options=names, description="Fighter 2:")
@@ -139,8 +126,8 @@ def preview():
             print("Please select two different fighters.")
             return
 
-        f1_data = next(f for f in fighters if f["name"] == f1.value)
-        f2_data = next(f for f in fighters if f["name"] == f2.value)
+        f1_data = by_name[f1.value]
+        f2_data = by_name[f2.value]
 
         display(pd.DataFrame([f1_data, f2_data]))
 #Main Function
@@ -3,10 +3,10 @@
 import os
 import sys
 import warnings
-import pandas as pd
 import pygame
 
-from part2_load_fighters import load_fighters, Fighter
+from part2_load_fighters import load_roster, Roster, Fighter
+from battle_store import save_moves
 
 try:
     SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -58,8 +58,8 @@ HIT_PAUSE_MS = 500
 BG = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
 BG.fill(WHITE)
 
-# Load fighters from CSV (from Part 2)
-fighters = load_fighters(CSV_PATH)
+# Load fighters from CSV (from Part 2; cached, see battle_roster.py)
+fighters = load_roster(CSV_PATH)
 
 # Sprite cache
 sprite_cache = {}
@@ -242,19 +242,6 @@ def animate_stamina_change(f1: Fighter, f2: Fighter, prev, cur, left=True, frame
                 pygame.quit(); sys.exit()
         CLOCK.tick(FPS)
 
-# Save battle moves to CSV
-def save_moves(move_log, path=MOVES_PATH):
-    if not move_log:
-        return
-    df = pd.DataFrame(move_log)
-    if os.path.exists(path):
-        try:
-            existing = pd.read_csv(path)
-            df = pd.concat([existing, df], ignore_index=True)
-        except Exception:
-            pass
-    df.to_csv(path, index=False)
-
 # Character selection UI
 def select_fighters_ui(fighters_list):
     CARD_W = 260
@@ -263,6 +250,8 @@ def select_fighters_ui(fighters_list):
 
     cols = min(3, len(fighters_list))
     selected = []
+    by_name = fighters_list.by_name if isinstance(fighters_list, Roster) \
+        else {f.name: f for f in reversed(fighters_list)}
 
     while True:
         win.fill((245, 245, 245))
@@ -303,9 +292,7 @@ def select_fighters_ui(fighters_list):
                     if len(selected) < 2:
                         selected.append(f.name)
                 if len(selected) == 2:
-                    f1 = next(ff for ff in fighters_list if ff.name == selected[0])
-                    f2 = next(ff for ff in fighters_list if ff.name == selected[1])
-                    return f1, f2
+                    return by_name[selected[0]], by_name[selected[1]]
 
         win.blit(
             FONT_MED.render("Click two fighters to select.", True, BLACK),
@@ -1,11 +1,12 @@
 # part5_stats_summary.py
 
 import os
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.patches import Patch
 
+from battle_stats import from_aggregates, summarize
+
 plt.rcParams["figure.figsize"] = (10, 5)
 
 SCRIPT_DIR = os.getcwd()
@@ -14,11 +15,17 @@ RESULTS_PATH = os.path.join(SCRIPT_DIR, "results.csv")
 
 # LOAD DATA
 
-if not os.path.exists(MOVES_PATH):
+if not os.path.exists(MOVES_PATH) and not os.path.exists(RESULTS_PATH):
     raise FileNotFoundError("battle_moves.csv not found. Run some battles first!")
 
-df_moves = pd.read_csv(MOVES_PATH)
-df_results = pd.read_csv(RESULTS_PATH) if os.path.exists(RESULTS_PATH) else None
+# per-fighter totals and win-rate curves kept up to date on every save;
+# STREAM_LOGS = True recomputes them in one chunked pass over the raw logs instead
+STREAM_LOGS = False
+
+if STREAM_LOGS:
+    move_counts, win_loss, win_curves = summarize()
+else:
+    move_counts, win_loss, win_curves = from_aggregates()
 
 print("Loaded move and result logs.")
 
@@ -26,14 +33,7 @@ print("Loaded move and result logs.")
 
 print("\n----- 1. Fighter Participation Summary -----")
 
-df_part = (
-    df_moves
-    .groupby("attacker")
-    .size()
-    .reset_index(name="Total Moves")
-    .rename(columns={"attacker": "Fighter"})
-    .sort_values("Total Moves", ascending=False)
-)
+df_part = move_counts.table()
 
 display(df_part)
 
@@ -47,26 +47,7 @@ plt.show()
 
 print("\n----- 2. Win / Loss Summary -----")
 
-wins = df_results["winner"].value_counts()
-losses = df_results["loser"].value_counts()
-
-fighters = sorted(set(wins.index).union(losses.index))
-rows = []
-
-for f in fighters:
-    w = wins.get(f, 0)
-    l = losses.get(f, 0)
-    total = w + l
-    winrate = w / total if total > 0 else 0
-    rows.append([f, w, l, total, winrate])
-
-df_win = pd.DataFrame(
-    rows,
-    columns=["Fighter", "Wins", "Losses", "Total Fights", "Win Rate"]
-)
-
-df_win["Win Rate %"] = (df_win["Win Rate"] * 100).round(1)
-df_win = df_win.sort_values("Win Rate", ascending=False)
+df_win = win_loss.table()
 
 display(df_win)
 
@@ -176,24 +157,8 @@ print("\n----- 6. Win Rate Over Time -----")
 
 plt.figure(figsize=(10, 5))
 
-for fighter in df_results["winner"].unique():
-
-    fights = df_results[
-        (df_results["winner"] == fighter) |
-        (df_results["loser"] == fighter)
-    ].copy()
-
-    fights["Win"] = (fights["winner"] == fighter).astype(int)
-
-    fights["Win Rate %"] = (
-        fights["Win"].cumsum() / np.arange(1, len(fights) + 1)
-    ) * 100
-
-    plt.plot(
-        range(1, len(fights) + 1),
-        fights["Win Rate %"],
-        label=fighter
-    )
+for fighter, (fight_no, win_rate) in win_curves.items():
+    plt.plot(fight_no, win_rate, label=fighter)
 
 plt.xlabel("Fight Number (For That Fighter)")
 plt.ylabel("Win Rate (%)")
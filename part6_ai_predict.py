@@ -1,23 +1,14 @@
 # part6_ai_predict.py
 
-import os
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patheffects as pe
-from sklearn.ensemble import RandomForestClassifier
 from IPython.display import clear_output
 import ipywidgets as widgets
 
-plt.rcParams["figure.figsize"] = (10, 5)
-
-# Paths
-try:
-    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-except NameError:
-    SCRIPT_DIR = os.getcwd()
+from battle_model import load_predictor, FEATURES
 
-MOVES_PATH = os.path.join(SCRIPT_DIR, "battle_moves.csv")
+plt.rcParams["figure.figsize"] = (10, 5)
 
 # Output area
 
@@ -26,84 +17,29 @@ out6 = widgets.Output(layout={"border": "1px solid #ccc", "padding": "6px"})
 
 # LOAD + PREPARE MODEL
 
-def load_and_prepare():
-    if not os.path.exists(MOVES_PATH):
-        raise FileNotFoundError("battle_moves.csv missing — run battles first.")
-
-    df = pd.read_csv(MOVES_PATH)
-
-    kos = df[df["defender_health_after"] == 0]
-    winners = kos.groupby("battle_id")["attacker"].first().rename("winner")
-
-    agg = df.groupby(["battle_id", "attacker"]).agg(
-        total_damage=("damage_dealt", "sum"),
-        total_hits=("hit", "sum"),
-        moves_used=("turn", "count"),
-        crits=("critical", "sum"),
-        avg_damage=("damage_dealt", "mean"),
-        opp_hp_left=("defender_health_after", "last")
-    ).reset_index()
-
-    agg["crit_rate"] = agg["crits"] / agg["total_hits"].replace(0, 1)
-    agg = agg.merge(winners, on="battle_id", how="left")
-    agg["win"] = (agg["attacker"] == agg["winner"]).astype(int)
-
-    rows = []
-    for _, g in agg.groupby("battle_id"):
-        if len(g) < 2:
-            continue
-
-        g = g.sort_values("moves_used", ascending=False).head(2)
-        a, b = g.iloc[0], g.iloc[1]
-
-        def make_row(A, B):
-            return {
-                "fighterA": A["attacker"],
-                "fighterB": B["attacker"],
-                "DMG": A["total_damage"] - B["total_damage"],
-                "CRIT": A["crit_rate"] - B["crit_rate"],
-                "AVG": A["avg_damage"] - B["avg_damage"],
-                "MOVES": A["moves_used"] - B["moves_used"],
-                "OPP_HP_LEFT": A["opp_hp_left"] - B["opp_hp_left"],
-                "win": A["win"]
-            }
+# the saved model (battle_model.py), updated with battles recorded since it was
+# trained; retrain=True refits it on everything
+def load_and_prepare(retrain=False):
+    predictor = load_predictor(retrain_all=retrain)
+    return predictor, predictor.fighters
 
-        rows.append(make_row(a, b))
-        rows.append(make_row(b, a))
-
-    rel = pd.DataFrame(rows)
-    if rel.empty:
-        raise ValueError("Not enough usable battle data to train the AI.")
-
-    FEATURES = ["DMG", "CRIT", "AVG", "MOVES", "OPP_HP_LEFT"]
-
-    X = rel[FEATURES]
-    y = rel["win"]
-
-    model = RandomForestClassifier(n_estimators=300, random_state=60)
-    model.fit(X, y)
-
-    fighters = sorted(rel["fighterA"].unique())
-    return rel, model, FEATURES, fighters
-
-rel, model, FEATURES, fighters = load_and_prepare()
+predictor, fighters = load_and_prepare()
 
 
 # PREDICTION
+# fighter profiles and the all-pairs win matrix are computed once per model
 def predict_pair(f1, f2):
-    f1_rows = rel[rel["fighterA"] == f1]
-    f2_rows = rel[rel["fighterA"] == f2]
+    profiles = predictor.profiles
 
-    if len(f1_rows) < 5:
-        print(f"[X] Limited data for {f1} ({len(f1_rows)} samples)")
-    if len(f2_rows) < 5:
-        print(f"[X] Limited data for {f2} ({len(f2_rows)} samples)")
+    for f in (f1, f2):
+        samples = profiles.at[f, "samples"]
+        if samples < 5:
+            print(f"[X] Limited data for {f} ({samples} samples)")
 
-    f1s = f1_rows[FEATURES].mean().fillna(0)
-    f2s = f2_rows[FEATURES].mean().fillna(0)
+    f1s = profiles.loc[f1, FEATURES]
+    f2s = profiles.loc[f2, FEATURES]
 
-    row = (f1s - f2s).to_frame().T
-    prob = float(model.predict_proba(row)[0, 1])
+    prob = predictor.predict(f1, f2)
     return prob, f1s, f2s
 
 
@@ -201,6 +137,7 @@ def plot_radar(f1, f2, f1s, f2s):
 fighter1_dd = widgets.Dropdown(options=fighters, description="Fighter 1:")
 fighter2_dd = widgets.Dropdown(options=fighters, description="Fighter 2:")
 predict_btn = widgets.Button(description="Predict", button_style="success")
+retrain_btn = widgets.Button(description="Retrain", button_style="warning")
 
 def on_predict(b):
     with out6:
@@ -226,10 +163,21 @@ def on_predict(b):
         plot_win_probability_bar(f1, f2, prob)
         plot_radar(f1, f2, f1s, f2s)
 
+def on_retrain(b):
+    global predictor, fighters
+    with out6:
+        clear_output(wait=True)
+        print("Retraining on all battles...")
+        predictor, fighters = load_and_prepare(retrain=True)
+        fighter1_dd.options = fighters
+        fighter2_dd.options = fighters
+        print(f"Model retrained on {len(predictor.rel)} rows.")
+
 predict_btn.on_click(on_predict)
+retrain_btn.on_click(on_retrain)
 
 display(widgets.VBox([
     widgets.HTML("<h3><b>Part 6 — AI Fight Outcome Predictor</b></h3>"),
-    widgets.HBox([fighter1_dd, fighter2_dd, predict_btn]),
+    widgets.HBox([fighter1_dd, fighter2_dd, predict_btn, retrain_btn]),
     out6
 ]))
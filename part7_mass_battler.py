@@ -1,15 +1,20 @@
 # part7_mass_simulator
 
 import os
+import time
+from contextlib import nullcontext
 import pandas as pd
 import numpy as np
 from tqdm.auto import tqdm
 from IPython.display import display, clear_output
 import ipywidgets as widgets
 
-from part2_load_fighters import load_fighters
-from part4_battle import simulate_battle, save_results
-from part3_setup import save_moves
+from battle_engine import MAX_TICKS
+from battle_roster import load_roster
+from battle_store import save_moves, save_results, reserve_battle_ids
+from battle_parallel import run_parallel, simulate_chunk, make_chunks, make_pool, CHUNK_SIZE
+from battle_writer import StoreWriter
+from battle_stats import wilson_interval, battles_needed
 
 try:
     SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -19,13 +24,16 @@ except NameError:
 MOVES_PATH = os.path.join(SCRIPT_DIR, "battle_moves.csv")
 RESULTS_PATH = os.path.join(SCRIPT_DIR, "results.csv")
 
+# first batch in adaptive mode (later batches follow the battles still needed)
+ADAPTIVE_BATCH = 200
+
 
 #LOAD FIGHTERS
-fighters = load_fighters()
+fighters = load_roster()
 fighter_names = sorted(f.name for f in fighters)
 
 
-fighter_by_name = {f.name: f for f in fighters}
+fighter_by_name = fighters.by_name
 
 
 #CLEAR OUTPUT AREA FOR JUPYTER DISPLAY
@@ -35,63 +43,104 @@ part7_out = widgets.Output(
 )
 
 
-#HELPER FUNCTIONS
-def get_next_battle_id():
-    if os.path.exists(RESULTS_PATH):
-        try:
-            df = pd.read_csv(RESULTS_PATH)
-            if len(df) > 0:
-                return df["battle_id"].max() + 1
-        except:
-            pass
-    return 1
-
 #RUN MANY BATTLES AUTOMATICALLY
-def run_many(f1, f2, n):
-
-    battle_id = get_next_battle_id()
+# workers=1 runs and writes in this process; anything else uses one process pool
+# (workers=None -> one per core) feeding a single writer process
+# log="summary"/"outcome" skips per-turn move logs (sample_rate keeps full logs
+# for that share of battles); keep_moves=False stores only results rows --
+# move logs come back from the seed
+#
+# adaptive mode (half_width and/or time_budget seconds): n is only the cap;
+# battles run in batches until the Wilson interval for f1's win rate is within
+# ±half_width at the given confidence, or the time budget is spent. The estimate
+# is printed and kept in df.attrs (estimate, low, high, battles); draws count as
+# f1 not winning.
+def run_many(f1, f2, n, workers=1, chunk_size=CHUNK_SIZE, keep_moves=True,
+             log="full", sample_rate=0.0, half_width=None, time_budget=None,
+             confidence=0.95):
+    if n < 1:
+        raise ValueError("n must be at least 1.")
+
+    adaptive = half_width is not None or time_budget is not None
+    started = time.perf_counter()
     results = []
-
-    for _ in tqdm(range(n), desc="Simulating battles"):
-
-        moves, turns = simulate_battle(
-            fighter_by_name[f1],
-            fighter_by_name[f2],
-            battle_id
-        )
-
-        save_moves(moves)
-
-        df = pd.DataFrame(moves)
-
-        kos = df[df["defender_health_after"] == 0]
-
-        if len(kos) == 0:
-            battle_id += 1
-            continue
-
-        ko = kos.iloc[-1]
-        winner = ko["attacker"]
-        loser = ko["defender"]
-
-        stats = {
-            "battle_id": battle_id,
-            "fighter1": f1,
-            "fighter2": f2,
-            "winner": winner,
-            "loser": loser,
-            "turns": turns
-        }
-
-        save_results(stats)
-        results.append(stats)
-
-        battle_id += 1
+    done = wins = 0
+    low, high = 0.0, 1.0
+    batch = min(n, ADAPTIVE_BATCH) if adaptive else n
+
+    # one writer process and one pool for every batch when running on a pool
+    with (StoreWriter() if workers != 1 else nullcontext()) as writer, \
+            (make_pool(workers, writer) if writer is not None else nullcontext()) as pool, \
+            tqdm(total=n, desc="Simulating battles") as bar:
+        while done < n:
+            count = min(batch, n - done)
+            stats = run_block(f1, f2, count, workers, chunk_size, keep_moves, log,
+                              sample_rate, writer, bar, pool)
+            results.extend(stats)
+            done += count
+            if not adaptive:
+                break
+
+            wins += sum(r["winner"] == f1 for r in stats)
+            low, high = wilson_interval(wins, done, confidence)
+            if half_width is not None and (high - low) / 2 <= half_width:
+                break
+            if time_budget is not None and time.perf_counter() - started >= time_budget:
+                break
+
+            # aim the next batch at the battles still needed, at most doubling
+            if half_width is not None:
+                needed = battles_needed((low + high) / 2, half_width, confidence) - done
+                batch = min(max(needed, ADAPTIVE_BATCH), done)
+            else:
+                batch = min(2 * batch, done)
 
     if len(results) == 0:
         print("WARNING: No completed battles recorded.")
+    elif len(results) < done:
+        print(f"{done - len(results)} battles hit the {MAX_TICKS}-tick cap (draws, not recorded).")
+
+    df = pd.DataFrame(results)
+    if adaptive and done:
+        df.attrs = {"estimate": wins / done, "low": low, "high": high, "battles": done}
+        print(f"{f1} beats {f2} {wins / done:.1%} of the time "
+              f"({confidence:.0%} interval {low:.1%} - {high:.1%}) after {done} battles")
+    return df
+
+
+# one block of count battles, written to the store; returns its results rows
+# (with a writer, on `pool` when given)
+def run_block(f1, f2, count, workers, chunk_size, keep_moves, log, sample_rate,
+              writer=None, bar=None, pool=None):
+    # claim all count IDs up front; workers number their blocks from this range
+    battle_id = reserve_battle_ids(count)
+    results = []
 
-    return pd.DataFrame(results)
+    if writer is not None:
+        # workers push their blocks to one writer process; only results come back here
+        for done, _, stats in run_parallel(
+            fighter_by_name[f1],
+            fighter_by_name[f2],
+            count, battle_id, workers, chunk_size, keep_moves, log, sample_rate,
+            writer=writer, pool=pool
+        ):
+            results.extend(stats)
+            if bar is not None:
+                bar.update(done)
+    else:
+        # one transaction per block of battles
+        for start, size in make_chunks(battle_id, count, chunk_size):
+            moves, stats = simulate_chunk(
+                fighter_by_name[f1],
+                fighter_by_name[f2],
+                start, size, keep_moves, log, sample_rate
+            )
+            save_moves(moves)
+            save_results(stats)
+            results.extend(stats)
+            if bar is not None:
+                bar.update(size)
+    return results
 
 
 # USER INTERFACE ELEMENTS
@@ -112,6 +161,15 @@ num_box = widgets.IntText(
     description="# Battles:"
 )
 
+# 0 = run exactly # Battles; otherwise stop once the win rate is known to ±this
+ci_box = widgets.BoundedFloatText(
+    value=0.0,
+    min=0.0,
+    max=0.5,
+    step=0.005,
+    description="Target ±:"
+)
+
 simulate_btn = widgets.Button(
     description="Run Simulations",
     button_style="success"
@@ -131,10 +189,17 @@ def on_simulate(b):
         if f1 == f2:
             print("Pick two different fighters.")
             return
+        if n < 1:
+            print("Run at least one battle.")
+            return
 
-        print(f"Running {n} simulated battles: {f1} vs {f2}...\n")
+        if ci_box.value:
+            print(f"Running up to {n} simulated battles: {f1} vs {f2} "
+                  f"(until the win rate is known to ±{ci_box.value:.1%})...\n")
+        else:
+            print(f"Running {n} simulated battles: {f1} vs {f2}...\n")
 
-        df = run_many(f1, f2, n)
+        df = run_many(f1, f2, n, half_width=ci_box.value or None)
 
         print("Simulation complete! Sample of recorded results:")
         display(df.head())
@@ -154,7 +219,7 @@ display(
             "<h3>Part 7 — Mass Battle Simulator</h3>"
             "<p>Generate large datasets for statistics and AI training.</p>"
         ),
-        widgets.HBox([fighter1_dd, fighter2_dd, num_box, simulate_btn]),
+        widgets.HBox([fighter1_dd, fighter2_dd, num_box, ci_box, simulate_btn]),
         part7_out
     ])
 )
@@ -6,9 +6,10 @@ import pandas as pd
 from IPython.display import display, clear_output
 import ipywidgets as widgets
 
-from part2_load_fighters import load_fighters
-from part4_battle import simulate_battle, save_results
-from part3_setup import save_moves
+from battle_roster import load_roster
+from battle_store import save_moves, save_results, reserve_battle_ids
+from battle_parallel import simulate_chunk, run_matches, make_pool
+from battle_writer import StoreWriter
 
 try:
     SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -19,9 +20,9 @@ RESULTS_PATH = os.path.join(SCRIPT_DIR, "results.csv")
 
 
 # LOAD FIGHTERS
-fighters = load_fighters()
+fighters = load_roster()
 fighter_names = [f.name for f in fighters]
-fighter_by_name = {f.name: f for f in fighters}
+fighter_by_name = fighters.by_name
 
 
 # OUTPUT AREA
@@ -30,89 +31,88 @@ part8_out = widgets.Output(
 )
 
 
-# HELPERS
-
-def get_next_battle_id():
-    if os.path.exists(RESULTS_PATH):
-        try:
-            df = pd.read_csv(RESULTS_PATH)
-            if len(df) > 0:
-                return df["battle_id"].max() + 1
-        except:
-            pass
-    return 1
-
-
 # RUN ONE MATCH
 
-def run_match(f1, f2, fights_per_match, battle_id):
+# match winner and wins per fighter from a match's results rows
+def tally(f1, f2, results):
     wins = {f1: 0, f2: 0}
+    for stats in results:
+        wins[stats["winner"]] += 1
+    return max(wins, key=wins.get), wins
+
+
+# log / sample_rate as in simulate_outcome; keep_moves=False stores only results rows
+def run_match(f1, f2, fights_per_match, battle_id, keep_moves=True,
+              log="full", sample_rate=0.0):
+    # the whole match is saved in one transaction
+    moves, results = simulate_chunk(
+        fighter_by_name[f1],
+        fighter_by_name[f2],
+        battle_id, fights_per_match, keep_moves, log, sample_rate
+    )
+    battle_id += fights_per_match
 
-    for _ in range(fights_per_match):
-        moves, turns = simulate_battle(
-            fighter_by_name[f1],
-            fighter_by_name[f2],
-            battle_id
-        )
-        save_moves(moves)
-
-        df = pd.DataFrame(moves)
-        kos = df[df["defender_health_after"] == 0]
-
-        if len(kos) == 0:
-            battle_id += 1
-            continue
-
-        ko = kos.iloc[-1]
-        winner = ko["attacker"]
-        loser = ko["defender"]
+    save_moves(moves)
+    save_results(results)
 
-        wins[winner] += 1
+    match_winner, wins = tally(f1, f2, results)
+    return match_winner, wins, battle_id
 
-        save_results({
-            "battle_id": battle_id,
-            "fighter1": f1,
-            "fighter2": f2,
-            "winner": winner,
-            "loser": loser,
-            "turns": turns
-        })
 
-        battle_id += 1
+# RUN FULL BRACKET
 
-    match_winner = max(wins, key=wins.get)
-    return match_winner, wins, battle_id
+# workers=1 plays every match here; anything else plays each round's matches
+# on a process pool (one for the whole bracket) feeding a single writer process
+def run_bracket(fighter_list, fights_per_match, keep_moves=True,
+                log="full", sample_rate=0.0, workers=1):
+    if workers == 1:
+        return play_bracket(fighter_list, fights_per_match, keep_moves, log, sample_rate)
 
+    with StoreWriter() as writer, make_pool(workers, writer) as pool:
+        return play_bracket(fighter_list, fights_per_match, keep_moves, log, sample_rate,
+                            workers, writer, pool)
 
-# RUN FULL BRACKET
 
-def run_bracket(fighter_list, fights_per_match):
-    battle_id = get_next_battle_id()
+# the bracket itself: matches play here, or on `pool` through `writer` when given
+def play_bracket(fighter_list, fights_per_match, keep_moves, log, sample_rate,
+                 workers=1, writer=None, pool=None):
+    # a knockout bracket always plays len(fighter_list) - 1 matches
+    battle_id = reserve_battle_ids(fights_per_match * max(0, len(fighter_list) - 1))
     round_num = 1
     fighters = fighter_list[:]
 
     while len(fighters) > 1:
         print(f"\nROUND {round_num}")
         next_round = []
-
-        for i in range(0, len(fighters), 2):
-
-            # Bye if odd number
-            if i + 1 >= len(fighters):
-                print(f"{fighters[i]} advances with a BYE")
-                next_round.append(fighters[i])
-                continue
-
-            f1 = fighters[i]
-            f2 = fighters[i + 1]
-
-            winner, wins, battle_id = run_match(
-                f1, f2, fights_per_match, battle_id
-            )
+        pairs = [(fighters[i], fighters[i + 1]) for i in range(0, len(fighters) - 1, 2)]
+
+        if writer is not None:
+            matches = [
+                (fighter_by_name[f1], fighter_by_name[f2], battle_id + k * fights_per_match)
+                for k, (f1, f2) in enumerate(pairs)
+            ]
+            round_results = run_matches(matches, fights_per_match, writer, workers,
+                                        keep_moves, log, sample_rate, pool)
+            battle_id += len(pairs) * fights_per_match
+        else:
+            round_results = None
+
+        for k, (f1, f2) in enumerate(pairs):
+            if round_results is not None:
+                winner, wins = tally(f1, f2, round_results[k])
+            else:
+                winner, wins, battle_id = run_match(
+                    f1, f2, fights_per_match, battle_id, keep_moves, log, sample_rate
+                )
 
             print(f"{f1} vs {f2} → {winner} wins ({wins[f1]}–{wins[f2]})")
             next_round.append(winner)
 
+        # Bye if odd number
+        if len(fighters) % 2 == 1:
+            print(f"{fighters[-1]} advances with a BYE")
+            next_round.append(fighters[-1])
+
         fighters = next_round
         round_num += 1
 
@@ -0,0 +1,86 @@
+# test_battle_retention.py
+
+import pytest
+
+import battle_db
+import battle_retention
+from battle_engine import Fighter
+from battle_parallel import simulate_chunk
+
+FIGHTERS = [
+    Fighter({"name": "Cheetah", "health": 100, "strength": 26, "defense": 10, "speed": 25,
+             "stamina": 100, "critchance": 0.2, "critmult": 1.5, "evasion": 0.18,
+             "stamina_regen": 4, "stamina_light": 6, "stamina_heavy": 12}),
+    Fighter({"name": "Retro", "health": 125, "strength": 22, "defense": 16, "speed": 10,
+             "stamina": 125, "critchance": 0.1, "critmult": 2.0, "evasion": 0.06,
+             "stamina_regen": 2, "stamina_light": 8, "stamina_heavy": 16}),
+    Fighter({"name": "Pixel", "health": 85, "strength": 33, "defense": 3, "speed": 17,
+             "stamina": 75, "critchance": 0.25, "critmult": 1.8, "evasion": 0.12,
+             "stamina_regen": 3, "stamina_light": 6, "stamina_heavy": 12}),
+]
+
+
+# rounds of interleaved matchups, so a per-matchup quota rolls up battles from
+# the middle of every fighter's history; one matchup keeps its move logs
+def play(conn, rounds, first_id):
+    c, r, p = FIGHTERS
+    battle_id = first_id
+    for _ in range(rounds):
+        for f1, f2, keep_moves in ((c, r, True), (r, p, False), (p, c, False)):
+            moves, results = simulate_chunk(f1, f2, battle_id, 15, keep_moves)
+            battle_db.insert_moves(conn, moves)
+            battle_db.insert_results(conn, results)
+            battle_id += 15
+    return battle_id
+
+
+def snapshot(conn):
+    curves = battle_db.win_rate_curves(conn)
+    return (list(curves), {f: (xs.tolist(), ys.tolist()) for f, (xs, ys) in curves.items()},
+            battle_db.fighter_table(conn).to_dict("records"),
+            battle_db.matchup_table(conn).to_dict("records"))
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # few enough points that the curves get decimated
+    monkeypatch.setattr(battle_db, "MAX_POINTS", 16)
+    path = str(tmp_path / "battles.db")
+    conn = battle_db.connect(path)
+    yield conn, path, tmp_path
+    conn.close()
+
+
+def compact(path, tmp_path, **kwargs):
+    return battle_retention.compact(
+        fighters=FIGHTERS, db_path=path, results_path=str(tmp_path / "results.csv"),
+        moves_path=str(tmp_path / "battle_moves.csv"), **kwargs
+    )
+
+
+# curves, totals and matchups survive a compaction and a rebuild after it,
+# twice over (the second roll-up extends the first one's prefix)
+def test_rebuild_after_compact_keeps_aggregates(store):
+    conn, path, tmp_path = store
+    next_id = play(conn, 6, 1)
+    before = snapshot(conn)
+
+    assert compact(path, tmp_path, before=100, keep=30, sample=0.1) > 0
+    db = battle_retention.database(path)
+    assert snapshot(db) == before
+    battle_db.rebuild_aggregates(db)
+    assert snapshot(db) == before
+
+    play(db, 4, next_id)
+    before = snapshot(db)
+    assert compact(path, tmp_path, keep=20) > 0
+    battle_db.rebuild_aggregates(db)
+    assert snapshot(db) == before
+
+
+def test_rebuild_matches_incremental(store):
+    conn, _, _ = store
+    play(conn, 4, 1)
+    before = snapshot(conn)
+    battle_db.rebuild_aggregates(conn)
+    assert snapshot(conn) == before
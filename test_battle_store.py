@@ -0,0 +1,62 @@
+# test_battle_store.py
+
+import warnings
+
+import pytest
+
+import battle_store
+from battle_engine import Fighter
+from battle_parallel import simulate_chunk
+
+CHEETAH = {"name": "Cheetah", "health": 100, "strength": 26, "defense": 10, "speed": 25,
+           "stamina": 100, "critchance": 0.2, "critmult": 1.5, "evasion": 0.18,
+           "stamina_regen": 4, "stamina_light": 6, "stamina_heavy": 12}
+RETRO = {"name": "Retro", "health": 125, "strength": 22, "defense": 16, "speed": 10,
+         "stamina": 125, "critchance": 0.1, "critmult": 2.0, "evasion": 0.06,
+         "stamina_regen": 2, "stamina_light": 8, "stamina_heavy": 16}
+PIXEL = {"name": "Pixel", "health": 85, "strength": 33, "defense": 3, "speed": 17,
+         "stamina": 75, "critchance": 0.25, "critmult": 1.8, "evasion": 0.12,
+         "stamina_regen": 3, "stamina_light": 6, "stamina_heavy": 12}
+FIGHTERS = [Fighter(CHEETAH), Fighter(RETRO), Fighter(PIXEL)]
+
+# Retro after a stat change: seeds recorded before it replay different battles
+CHANGED = [Fighter(CHEETAH), Fighter({**RETRO, "strength": 31}), Fighter(PIXEL)]
+
+
+# 40 battles kept only by seed (results rows, no stored moves): 1-20 Cheetah vs
+# Retro, 21-40 Cheetah vs Pixel
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "battles.db")
+    c, r, p = FIGHTERS
+    for f2, first_id in ((r, 1), (p, 21)):
+        _, results = simulate_chunk(c, f2, first_id, 20, keep_moves=False)
+        battle_store.save_results(results, db_path=path)
+    yield path
+    battle_store._databases.pop(path).close()
+
+
+def battle_moves(fighters, db_path):
+    df = battle_store.load_moves(fighters, ["battle_id", "turn", "damage_dealt"],
+                                 db_path=db_path)
+    return {b: g["damage_dealt"].tolist() for b, g in df.groupby("battle_id")}
+
+
+def test_seeds_replay_recorded_battles(db_path):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        moves = battle_moves(FIGHTERS, db_path)
+    assert sorted(moves) == list(range(1, 41))
+
+
+def test_changed_stats_leave_battles_out(db_path):
+    moves = battle_moves(FIGHTERS, db_path)
+    with pytest.warns(UserWarning, match="no longer replay"):
+        replayed = battle_moves(CHANGED, db_path)
+
+    # only Retro's battles can be left out, and what is kept is unchanged
+    assert set(range(21, 41)) <= set(replayed) < set(moves)
+    assert all(replayed[b] == moves[b] for b in replayed)
+    dropped = min(set(moves) - set(replayed))
+    with pytest.raises(ValueError, match="no longer replays"):
+        battle_store.load_battle(dropped, CHANGED, db_path=db_path)